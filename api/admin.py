@@ -0,0 +1,70 @@
+# app/api/admin.py
+from fastapi import APIRouter, HTTPException, Depends, Request, status
+from fastapi.responses import FileResponse, PlainTextResponse
+from typing import Any, Dict, List
+from app.core.config import get_settings
+from app.core import metrics
+from app.core.profiling import profile_store, is_trusted_token
+from app.core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+def require_admin(request: Request) -> None:
+    """Dependency that only lets requests carrying the admin token through"""
+    if not settings.ADMIN_TOKEN:
+        # Hide admin endpoints entirely while no token is configured
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    if not is_trusted_token(request.headers.get(settings.ADMIN_TOKEN_HEADER)):
+        logger.warning(f"Rejected admin request to {request.url.path}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get(
+    "/profiles",
+    summary="List stored request profiles",
+    response_description="Profile metadata, newest first"
+)
+async def list_profiles() -> List[Dict[str, Any]]:
+    """
+    List the request profiles kept in the on-disk ring.
+
+    Each entry contains the request method and path, status code, total
+    duration, per-phase timings (validation, db_query, commit, serialization)
+    and the top functions by cumulative time.
+    """
+    return profile_store.list()
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    summary="Download a request profile",
+    response_description="The raw pstats file"
+)
+async def download_profile(profile_id: str) -> FileResponse:
+    """
+    Download a stored profile as a pstats file, readable with
+    `python -m pstats` or snakeviz.
+    """
+    path = profile_store.path_for(profile_id)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    summary="Service metrics",
+    response_description="Metrics in the Prometheus text format"
+)
+async def get_metrics() -> str:
+    """
+    Expose in-process metrics, including the database circuit breaker state
+    (0=closed, 1=half_open, 2=open), failures and rejected calls.
+    """
+    return metrics.render()
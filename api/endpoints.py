@@ -1,17 +1,34 @@
 # app/api/endpoints.py
-from fastapi import APIRouter, HTTPException, Depends, status
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response, status
 from sqlalchemy.orm import Session
 import validators
-from typing import Dict
+from datetime import datetime, timezone
+from typing import Dict, List, Literal, Optional, Tuple
 from app.db.base import get_db
-from app.schemas.url import URLBase, URLInfo
-from app.services.shortener import create_url_record, get_url_by_shortcode
+from app.db.models import URL
+from app.schemas.url import (
+    URLBase, URLInfo, URLStats, ClickBucket, CustomURLAvailability, CustomURLAvailabilityList
+)
+from app.services.analytics import (
+    GRANULARITY_STEP, click_buffer, floor_bucket, get_click_buckets
+)
+from app.services.idempotency import MAX_KEY_LENGTH, idempotency_store, request_fingerprint
+from app.services.shortener import (
+    check_custom_urls, create_url_record, create_url_record_once, get_url_by_shortcode
+)
+from app.core.config import get_settings
 from app.core.logging import get_logger
+from app.core.profiling import phase
 
 # Add tags for API documentation organization
 router = APIRouter(tags=["URL Operations"])
+settings = get_settings()
 logger = get_logger(__name__)
 
+# Range returned when the client does not give a start
+DEFAULT_STATS_BUCKETS = {"hour": 24, "day": 30}
+
 @router.post(
     "/url",
     response_model=URLInfo,
@@ -21,7 +38,9 @@ logger = get_logger(__name__)
 )
 async def create_url(
     url: URLBase,
-    db: Session = Depends(get_db)
+    response: Response,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key", min_length=1, max_length=MAX_KEY_LENGTH)
 ) -> URLInfo:
     """
     Create a shortened URL from a target URL.
@@ -29,6 +48,9 @@ async def create_url(
     Parameters:
     - **target_url**: The original URL to be shortened (must be a valid URL)
     - **custom_url**: Optional custom URL path (4-30 alphanumeric characters and hyphens)
+    - **Idempotency-Key** (header): Optional client-chosen key. Retries with the same
+      key and body replay the first successful response (marked with an
+      `Idempotent-Replayed: true` header) instead of creating again.
 
     Returns:
     - **short_url**: The generated or custom short URL code
@@ -58,15 +80,99 @@ async def create_url(
     - **400**: Invalid URL format
     - **400**: Invalid custom URL format
     - **400**: Custom URL already taken
+    - **422**: Idempotency-Key already used with a different body
+    - **503**: Database unavailable (see the Retry-After header)
     """
-    if not validators.url(str(url.target_url)):
+    if idempotency_key is None:
+        _validate_target_url(url)
+        return _url_info(create_url_record(db, url))
+
+    key = idempotency_key
+    fingerprint = request_fingerprint(url.model_dump_json())
+
+    def create_once() -> Tuple[URLInfo, bool]:
+        record, replayed = create_url_record_once(db, url, key, fingerprint)
+        return _url_info(record), replayed
+
+    async def execute() -> Tuple[URLInfo, bool]:
+        _validate_target_url(url)
+        # Off the event loop, so a retry arriving meanwhile waits for this execution
+        return await asyncio.to_thread(create_once)
+    (result, db_replayed), replayed = await idempotency_store.run(key, fingerprint, execute)
+    if replayed or db_replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+def _validate_target_url(url: URLBase) -> None:
+    with phase("validation"):
+        is_valid = validators.url(str(url.target_url))
+    if not is_valid:
         logger.warning(f"Invalid URL format: {url.target_url}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid URL format"
         )
-    
-    return create_url_record(db, url)
+
+def _url_info(record: URL) -> URLInfo:
+    with phase("serialization"):
+        return URLInfo(
+            target_url=record.target_url,
+            custom_url=record.short_url if record.is_custom else None,
+            short_url=record.short_url,
+            created_at=record.created_at,
+            is_custom=record.is_custom
+        )
+
+@router.get(
+    "/custom/available",
+    response_model=CustomURLAvailabilityList,
+    summary="Check custom URL availability",
+    response_description="Availability of each code, with free alternatives for unavailable ones",
+    responses={
+        503: {
+            "description": "Database unavailable while the code index is still loading",
+            "headers": {"Retry-After": {"description": "Seconds to wait before retrying"}}
+        }
+    }
+)
+async def check_custom_url_availability(
+    code: List[str] = Query(..., description="Custom codes to check; repeat the parameter for several"),
+    suggestions: int = Query(default=3, ge=0, le=settings.CUSTOM_SUGGESTIONS_MAX),
+    db: Session = Depends(get_db)
+) -> CustomURLAvailabilityList:
+    """
+    Check many custom codes at once and suggest free alternatives.
+
+    Answered from an in-memory index of every short code in use, so no database
+    round trip is made per code. A code reported available can still be claimed
+    by someone else before it is created.
+
+    Parameters:
+    - **code**: Custom codes to check (repeatable)
+    - **suggestions**: Free alternatives to return per unavailable code (default: 3)
+
+    Example:
+    - GET /custom/available?code=my-link&code=admin&suggestions=2
+    - Returns: {"results": [
+      {"custom_url": "my-link", "available": false, "reason": "taken", "suggestions": ["my-link1", "my-link-1"]},
+      {"custom_url": "admin", "available": false, "reason": "invalid", "suggestions": ["admin1", "admin-1"]}]}
+
+    Raises:
+    - **400**: Too many codes
+    - **503**: Database unavailable (see the Retry-After header)
+    """
+    custom_urls = list(dict.fromkeys(code))
+    if len(custom_urls) > settings.CUSTOM_CHECK_MAX_CODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.CUSTOM_CHECK_MAX_CODES} codes can be checked at once"
+        )
+
+    results = check_custom_urls(db, custom_urls, suggestions)
+    with phase("serialization"):
+        return CustomURLAvailabilityList(results=[
+            CustomURLAvailability(**result._asdict()) for result in results
+        ])
 
 @router.get(
     "/{short_url}",
@@ -89,6 +195,10 @@ async def create_url(
                     "example": {"detail": "URL not found"}
                 }
             }
+        },
+        503: {
+            "description": "Database unavailable and the short code is not cached",
+            "headers": {"Retry-After": {"description": "Seconds to wait before retrying"}}
         }
     }
 )
@@ -109,11 +219,105 @@ async def redirect_to_url(
     - GET /{short_url}
     - Returns: {"url": "https://example.com/original/url"}
     """
-    url = get_url_by_shortcode(db, short_url)
-    if url is None:
+    original_url = get_url_by_shortcode(db, short_url)
+    if original_url is None:
         logger.warning(f"URL not found: {short_url}")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="URL not found"
         )
-    return {"url": url.original_url}
\ No newline at end of file
+    if settings.ANALYTICS_ENABLED:
+        click_buffer.record(short_url)
+    return {"url": original_url}
+
+def as_utc(value: datetime) -> datetime:
+    """Naive UTC datetime, the form rollup buckets are stored in"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+@router.get(
+    "/url/{short_url}/stats",
+    response_model=URLStats,
+    summary="Get click statistics",
+    response_description="Clicks per hour or day for the given short code",
+    responses={
+        404: {
+            "description": "URL not found",
+            "content": {
+                "application/json": {
+                    "example": {"detail": "URL not found"}
+                }
+            }
+        },
+        503: {
+            "description": "Database unavailable",
+            "headers": {"Retry-After": {"description": "Seconds to wait before retrying"}}
+        }
+    }
+)
+async def get_url_stats(
+    short_url: str,
+    granularity: Literal["hour", "day"] = Query(default="day"),
+    start: Optional[datetime] = Query(default=None),
+    end: Optional[datetime] = Query(default=None),
+    db: Session = Depends(get_db)
+) -> URLStats:
+    """
+    Clicks on a short URL, bucketed by hour or day (UTC).
+
+    Answered from precomputed rollups only. Clicks reach the rollups within
+    ANALYTICS_FLUSH_INTERVAL seconds; hourly buckets older than
+    ANALYTICS_HOURLY_RETENTION_DAYS are only kept as daily totals. Empty buckets
+    are omitted.
+
+    Parameters:
+    - **short_url**: The short URL code (path parameter)
+    - **granularity**: "hour" or "day" (default: "day")
+    - **start**: First bucket to include (default: 24 hours or 30 days before end)
+    - **end**: Buckets starting before this are included (default: now)
+
+    Example:
+    - GET /url/{short_url}/stats?granularity=hour&start=2024-01-07T00:00:00
+    - Returns: {"short_url": "my-custom-url", "granularity": "hour", "total_clicks": 42,
+      "buckets": [{"bucket": "2024-01-07T12:00:00", "clicks": 42}], ...}
+
+    Raises:
+    - **400**: Invalid range
+    - **404**: URL not found
+    - **503**: Database unavailable (see the Retry-After header)
+    """
+    if get_url_by_shortcode(db, short_url) is None:
+        logger.warning(f"URL not found: {short_url}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="URL not found"
+        )
+
+    step = GRANULARITY_STEP[granularity]
+    end = as_utc(end) if end else datetime.utcnow()
+    # Round out to whole buckets: every bucket starting before `end` is included
+    if floor_bucket(end, granularity) < end:
+        end = floor_bucket(end, granularity) + step
+    start = floor_bucket(as_utc(start), granularity) if start else end - step * DEFAULT_STATS_BUCKETS[granularity]
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    if (end - start) / step > settings.ANALYTICS_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range exceeds {settings.ANALYTICS_MAX_BUCKETS} {granularity} buckets"
+        )
+
+    buckets = get_click_buckets(db, short_url, granularity, start, end)
+    with phase("serialization"):
+        return URLStats(
+            short_url=short_url,
+            granularity=granularity,
+            start=start,
+            end=end,
+            total_clicks=sum(clicks for _, clicks in buckets),
+            buckets=[ClickBucket(bucket=bucket, clicks=clicks) for bucket, clicks in buckets]
+        )
\ No newline at end of file
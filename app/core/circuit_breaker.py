@@ -0,0 +1,131 @@
+# app/core/circuit_breaker.py
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Tuple, Type
+from app.core.metrics import Counter, Gauge
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+circuit_state = Gauge("circuit_breaker_state", "Circuit breaker state (0=closed, 1=half_open, 2=open)")
+circuit_failures = Counter("circuit_breaker_failures_total", "Calls that failed or exceeded the slow-call threshold")
+circuit_rejections = Counter("circuit_breaker_rejections_total", "Calls rejected while the circuit was open")
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"Circuit '{name}' is open, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Trips open after `failure_threshold` consecutive failures and rejects calls
+    for `reset_timeout` seconds. After that a single trial call is let through
+    (half-open); its outcome closes or re-opens the circuit.
+
+    Calls slower than `slow_call_threshold` seconds count as failures, so a
+    database that still answers but is stuck behind a lock trips the breaker too.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        slow_call_threshold: float,
+        failure_exceptions: Tuple[Type[BaseException], ...]
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call_threshold = slow_call_threshold
+        self.failure_exceptions = failure_exceptions
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        circuit_state.set(STATE_VALUES[CLOSED], breaker=name)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._remaining() <= 0:
+                return HALF_OPEN
+            return self._state
+
+    def retry_after(self) -> int:
+        """Seconds until the circuit lets a trial call through (at least 1)"""
+        with self._lock:
+            return max(1, math.ceil(self._remaining())) if self._state == OPEN else 1
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may proceed"""
+        with self._lock:
+            if self._state == OPEN:
+                if self._remaining() > 0:
+                    circuit_rejections.inc(breaker=self.name)
+                    raise CircuitOpenError(self.name, max(1, math.ceil(self._remaining())))
+                self._set_state(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._trial_in_flight:
+                    circuit_rejections.inc(breaker=self.name)
+                    raise CircuitOpenError(self.name, 1)
+                self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            if self._state != CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+                self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        circuit_failures.inc(breaker=self.name)
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f"Circuit '{self.name}' opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    @contextmanager
+    def call(self) -> Iterator[None]:
+        """Guard a block; failure exceptions and slow calls count against the circuit"""
+        self.before_call()
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except self.failure_exceptions:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            if failed or elapsed > self.slow_call_threshold:
+                if not failed:
+                    logger.warning(f"Slow call through circuit '{self.name}': {elapsed:.3f}s")
+                self.record_failure()
+            else:
+                # Other exceptions (e.g. HTTP errors) mean the backend answered
+                self.record_success()
+
+    def _remaining(self) -> float:
+        return self.reset_timeout - (time.monotonic() - self._opened_at)
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+        circuit_state.set(STATE_VALUES[state], breaker=self.name)
@@ -11,10 +11,25 @@ class Settings(BaseSettings):
     
     # Database settings
     DATABASE_URL: str = "sqlite:///./shortener.db"
+    DB_QUERY_TIMEOUT: float = 2.0
+    DB_BREAKER_FAILURE_THRESHOLD: int = 5
+    DB_BREAKER_RESET_TIMEOUT: int = 30
+    # Warn when one request runs the same statement more often than this
+    N_PLUS_ONE_THRESHOLD: int = 5
     
     # API settings
     API_PREFIX: str = ""
     
+    # Server (app.server pre-fork launcher; SERVER_WORKERS=0 means one per core)
+    SERVER_HOST: str = "127.0.0.1"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0
+    SERVER_REUSE_PORT: bool = False
+    WORKER_MAX_REQUESTS: int = 0
+    WORKER_MAX_REQUESTS_JITTER: int = 0
+    WORKER_HEALTH_TIMEOUT: float = 30.0
+    WORKER_GRACEFUL_TIMEOUT: float = 30.0
+    
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FORMAT: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -24,6 +39,70 @@ class Settings(BaseSettings):
     MIN_CUSTOM_URL_LENGTH: int = 4
     MAX_CUSTOM_URL_LENGTH: int = 30
     AUTO_URL_LENGTH: int = 8
+    # Store new target URLs as an interned domain plus compressed path and query
+    URL_COMPACT_STORAGE: bool = False
+    
+    # Lookup cache and warm-start snapshots (SNAPSHOT_PATH unset disables snapshots)
+    CACHE_MAX_ENTRIES: int = 10000
+    SNAPSHOT_PATH: Optional[str] = "url_cache.snapshot"
+    SNAPSHOT_INTERVAL: int = 300
+    SNAPSHOT_TOP_N: int = 5000
+    SNAPSHOT_MAX_AGE: int = 86400
+    
+    # Click analytics: hits are buffered in memory and flushed to hourly rollups,
+    # which are compacted into daily rollups after ANALYTICS_HOURLY_RETENTION_DAYS
+    ANALYTICS_ENABLED: bool = True
+    ANALYTICS_FLUSH_INTERVAL: float = 10.0
+    ANALYTICS_MAX_PENDING: int = 100000
+    ANALYTICS_HOURLY_RETENTION_DAYS: int = 7
+    ANALYTICS_MAX_BUCKETS: int = 1000
+    
+    # Cold-link tiering: URLs older than TIERING_COLD_AFTER_DAYS without clicks in
+    # that window move to immutable segment files in SEGMENT_DIR (unset disables it)
+    SEGMENT_DIR: Optional[str] = None
+    SEGMENT_BLOCK_SIZE: int = 128
+    SEGMENT_BLOOM_FP_RATE: float = 0.01
+    SEGMENT_MAX_COUNT: int = 8
+    TIERING_INTERVAL: int = 3600
+    TIERING_COLD_AFTER_DAYS: int = 180
+    TIERING_BATCH_SIZE: int = 100000
+    
+    # Background target URL checks (dead links, page titles for previews)
+    LINK_CHECK_ENABLED: bool = False
+    LINK_CHECK_QUEUE_SIZE: int = 10000
+    LINK_CHECK_CONCURRENCY: int = 50
+    LINK_CHECK_PER_HOST: int = 2
+    LINK_CHECK_TIMEOUT: float = 5.0
+    LINK_CHECK_MAX_BYTES: int = 65536
+    LINK_CHECK_BATCH_SIZE: int = 100
+    LINK_CHECK_FLUSH_INTERVAL: float = 2.0
+    # Allow checks of loopback and private addresses (tests and internal deployments)
+    LINK_CHECK_ALLOW_PRIVATE: bool = False
+    
+    # Custom code availability: an in-memory index of every short code, refreshed
+    # from rows created by other workers every CODE_INDEX_REFRESH_INTERVAL seconds
+    CODE_INDEX_ENABLED: bool = True
+    CODE_INDEX_REFRESH_INTERVAL: float = 5.0
+    CODE_INDEX_MERGE_THRESHOLD: int = 4096
+    CUSTOM_CHECK_MAX_CODES: int = 50
+    CUSTOM_SUGGESTIONS_MAX: int = 10
+    
+    # Creates sent with an Idempotency-Key, replayed to retries for IDEMPOTENCY_TTL
+    # seconds. Keys are stored in the database; each worker also keeps the most
+    # recent IDEMPOTENCY_MAX_KEYS results in memory.
+    IDEMPOTENCY_TTL: float = 3600.0
+    IDEMPOTENCY_MAX_KEYS: int = 10000
+    IDEMPOTENCY_CLEANUP_INTERVAL: float = 600.0
+    
+    # Admin settings (admin endpoints are disabled while no token is set)
+    ADMIN_TOKEN: Optional[str] = None
+    ADMIN_TOKEN_HEADER: str = "X-Admin-Token"
+    
+    # Profiling
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_HEADER: str = "X-Profile-Token"
+    PROFILE_DIR: str = "profiles"
+    PROFILE_MAX_FILES: int = 50
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,82 @@
+# app/core/metrics.py
+"""Minimal in-process metrics registry rendered in the Prometheus text format"""
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+LabelValues = Tuple[Tuple[str, str], ...]
+
+
+class Metric:
+    """Base class for registered metrics"""
+    type_name = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def samples(self) -> List[Tuple[LabelValues, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+    def value(self, **labels: str) -> float:
+        """Return the current value for a label set (0 if never set)"""
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+
+class Counter(Metric):
+    """Monotonically increasing value"""
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    """Value that can go up and down, or be read from a callback at render time"""
+    type_name = "gauge"
+
+    def __init__(self, name: str, description: str, function: Optional[Callable[[], float]] = None):
+        super().__init__(name, description)
+        self.function = function
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[Tuple[LabelValues, float]]:
+        if self.function is not None:
+            return [((), float(self.function()))]
+        return super().samples()
+
+
+registry: List[Metric] = []
+
+
+def _label_key(labels: Dict[str, str]) -> LabelValues:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def render() -> str:
+    """Render all registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in registry:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.type_name}")
+        for labels, value in metric.samples():
+            label_text = ",".join(f'{label}="{label_value}"' for label, label_value in labels)
+            lines.append(f"{metric.name}{{{label_text}}} {value:g}" if label_text else f"{metric.name} {value:g}")
+    return "\n".join(lines) + "\n"
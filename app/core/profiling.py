@@ -0,0 +1,181 @@
+# app/core/profiling.py
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+from app.core.config import get_settings
+from app.core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+PROFILE_ID_PATTERN = re.compile(r'^[0-9T]+-[0-9a-f]+$')
+
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+
+# cProfile hooks the whole event loop thread, so only one request is profiled at a time
+_profiler_lock = threading.Lock()
+
+
+class RequestProfile:
+    """Call-stack profile and per-phase timings of a single request"""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.profiler = cProfile.Profile()
+        self.phases: Dict[str, float] = {}
+        self.started_at = datetime.utcnow()
+        self.duration_ms = 0.0
+        self.status_code: Optional[int] = None
+
+    def add_phase(self, name: str, elapsed: float) -> None:
+        """Accumulate elapsed seconds for a phase (stored in milliseconds)"""
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed * 1000
+
+    def hotspots(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Return the functions with the highest cumulative time"""
+        # The raw stats dict keeps integer call counts; it is missing from the typeshed stubs
+        stats = pstats.Stats(self.profiler).stats  # type: ignore[attr-defined]
+        top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [
+            {
+                "function": f"{filename}:{line}({name})",
+                "calls": calls,
+                "total_ms": round(total * 1000, 3),
+                "cumulative_ms": round(cumulative * 1000, 3),
+            }
+            for (filename, line, name), (_, calls, total, cumulative, _) in top
+        ]
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time a request phase (validation, db_query, commit, serialization) if the request is profiled"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_phase(name, time.perf_counter() - start)
+
+
+class ProfileStore:
+    """Bounded on-disk ring of request profiles"""
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+
+    def save(self, profile: RequestProfile) -> str:
+        """Write the pstats dump and its metadata, dropping the oldest profiles past the limit"""
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f"{profile.started_at.strftime('%Y%m%dT%H%M%S%f')}-{secrets.token_hex(4)}"
+        profile.profiler.dump_stats(os.path.join(self.directory, f"{profile_id}.prof"))
+        metadata = {
+            "id": profile_id,
+            "method": profile.method,
+            "path": profile.path,
+            "status_code": profile.status_code,
+            "started_at": profile.started_at.isoformat(),
+            "duration_ms": round(profile.duration_ms, 3),
+            "phases": {name: round(ms, 3) for name, ms in profile.phases.items()},
+            "hotspots": profile.hotspots(),
+        }
+        with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as f:
+            json.dump(metadata, f)
+        self._prune()
+        return profile_id
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Return profile metadata, newest first"""
+        profiles = []
+        for profile_id in reversed(self._ids()):
+            try:
+                with open(os.path.join(self.directory, f"{profile_id}.json")) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                # Pruned by a concurrent save
+                continue
+        return profiles
+
+    def path_for(self, profile_id: str) -> Optional[str]:
+        """Return the pstats file path for a profile id, if it exists"""
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.prof")
+        return path if os.path.exists(path) else None
+
+    def _ids(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        # Ids start with a timestamp, so lexical order is chronological
+        return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith(".json"))
+
+    def _prune(self) -> None:
+        ids = self._ids()
+        for profile_id in ids[:max(len(ids) - self.max_files, 0)]:
+            for ext in (".json", ".prof"):
+                try:
+                    os.remove(os.path.join(self.directory, f"{profile_id}{ext}"))
+                except FileNotFoundError:
+                    pass
+
+
+profile_store = ProfileStore(settings.PROFILE_DIR, settings.PROFILE_MAX_FILES)
+
+
+def is_trusted_token(token: Optional[str]) -> bool:
+    """Check a header value against the configured admin token"""
+    if not token or not settings.ADMIN_TOKEN:
+        return False
+    return secrets.compare_digest(token, settings.ADMIN_TOKEN)
+
+
+def should_profile(request: Request) -> bool:
+    """Profile requests carrying the trusted header, plus a random sample of the rest"""
+    if is_trusted_token(request.headers.get(settings.PROFILE_HEADER)):
+        return True
+    return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+
+async def profile_request(request: Request, call_next):
+    """HTTP middleware that profiles sampled requests and stores the result"""
+    if not should_profile(request) or not _profiler_lock.acquire(blocking=False):
+        return await call_next(request)
+
+    profile = RequestProfile(request.method, request.url.path)
+    token = _current_profile.set(profile)
+    start = time.perf_counter()
+    profile.profiler.enable()
+    try:
+        response = await call_next(request)
+    finally:
+        profile.profiler.disable()
+        profile.duration_ms = (time.perf_counter() - start) * 1000
+        _current_profile.reset(token)
+        _profiler_lock.release()
+
+    profile.status_code = response.status_code
+    try:
+        profile_id = await run_in_threadpool(profile_store.save, profile)
+        response.headers["X-Profile-Id"] = profile_id
+        logger.info(f"Stored profile {profile_id} for {profile.method} {profile.path}")
+    except OSError as e:
+        logger.error(f"Failed to store profile: {str(e)}")
+    return response
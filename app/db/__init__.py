@@ -1,2 +1,2 @@
-from app.db.base import Base, engine, SessionLocal, get_db
-from app.db.models import URL
+from app.db.base import Base, engine, SessionLocal, get_db, db_breaker
+from app.db.models import URL, Domain, CompressionDictionary, HourlyClicks, DailyClicks, LinkCheck, IdempotencyKey
@@ -1,19 +1,47 @@
 # app/db/base.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import OperationalError, TimeoutError as SATimeoutError
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from app.core.config import get_settings
 from app.core.logging import get_logger
+from app.core.circuit_breaker import CircuitBreaker
 
 settings = get_settings()
 logger = get_logger(__name__)
 
-# Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
+# Create database engine. SQLite waits at most DB_QUERY_TIMEOUT for a locked
+# database; PostgreSQL cancels statements running longer than that. Every other
+# backend only bounds the wait for a pooled connection, so slow queries there
+# run to completion and are counted by the breaker afterwards.
+backend = make_url(settings.DATABASE_URL).get_backend_name()
+if backend == "sqlite":
+    engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": settings.DB_QUERY_TIMEOUT}
+    )
+elif backend == "postgresql":
+    engine = create_engine(
+        settings.DATABASE_URL,
+        pool_timeout=settings.DB_QUERY_TIMEOUT,
+        connect_args={"options": f"-c statement_timeout={int(settings.DB_QUERY_TIMEOUT * 1000)}"}
+    )
+else:
+    engine = create_engine(settings.DATABASE_URL, pool_timeout=settings.DB_QUERY_TIMEOUT)
+
+# Trips when the database keeps failing or answering slower than DB_QUERY_TIMEOUT
+db_breaker = CircuitBreaker(
+    "database",
+    failure_threshold=settings.DB_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.DB_BREAKER_RESET_TIMEOUT,
+    slow_call_threshold=settings.DB_QUERY_TIMEOUT,
+    failure_exceptions=(OperationalError, SATimeoutError)
 )
 
+# Dialects with INSERT ... ON CONFLICT DO UPDATE, used for batched upserts
+UPSERT_INSERT = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
 # Create sessionmaker
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
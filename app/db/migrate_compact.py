@@ -0,0 +1,151 @@
+# app/db/migrate_compact.py
+"""
+Convert stored target URLs to the compact representation (interned domain plus
+compressed path and query) and report database size and lookup cost before and
+after.
+
+Usage:
+    python -m app.db.migrate_compact [--train] [--batch-size 1000] [--vacuum]
+
+Set URL_COMPACT_STORAGE=True as well so new rows are stored compactly.
+"""
+import argparse
+import random
+import time
+from typing import Dict, List, Optional, cast
+from sqlalchemy import func, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.db.base import SessionLocal, engine
+from app.db.models import URL, CompressionDictionary, Domain
+from app.db.schema import upgrade_schema
+from app.services import compact
+from app.services.shortener import fetch_original_url
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+SEED = 1234
+
+
+def database_size(bind: Engine) -> Optional[int]:
+    """Size of the database file in bytes (SQLite only)"""
+    if bind.dialect.name != "sqlite":
+        return None
+    with bind.connect() as conn:
+        page_count = conn.execute(text("PRAGMA page_count")).scalar()
+        page_size = conn.execute(text("PRAGMA page_size")).scalar()
+    return page_count * page_size
+
+
+def url_storage_bytes(db: Session) -> int:
+    """Bytes spent on target URLs across plain and compact columns"""
+    plain = db.execute(select(func.coalesce(func.sum(func.length(URL.original_url)), 0))).scalar()
+    packed = db.execute(select(func.coalesce(func.sum(func.length(URL.compressed_path)), 0))).scalar()
+    domains = db.execute(select(func.coalesce(func.sum(func.length(Domain.prefix)), 0))).scalar()
+    return (plain or 0) + (packed or 0) + (domains or 0)
+
+
+def lookup_cost_us(db: Session, codes: List[str], rounds: int = 3) -> float:
+    """Mean microseconds per uncached lookup over the sample codes"""
+    if not codes:
+        return 0.0
+    compact.clear_caches()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for code in codes:
+            fetch_original_url(db, code)
+    return (time.perf_counter() - start) / (len(codes) * rounds) * 1e6
+
+
+def measure(db: Session, bind: Engine, codes: List[str]) -> Dict[str, Optional[float]]:
+    return {
+        "database_bytes": database_size(bind),
+        "url_bytes": url_storage_bytes(db),
+        "lookup_us": lookup_cost_us(db, codes),
+    }
+
+
+def train(db: Session, sample_size: int) -> int:
+    """Train a dictionary on a sample of stored URLs and store it, returning its id"""
+    urls = db.execute(
+        select(URL.original_url).where(URL.original_url.is_not(None)).limit(sample_size)
+    ).scalars().all()
+    dictionary = CompressionDictionary(data=compact.train_dictionary(urls))
+    db.add(dictionary)
+    db.commit()
+    logger.info(f"Trained a {len(cast(bytes, dictionary.data))} byte dictionary on {len(urls)} URLs")
+    return cast(int, dictionary.id)
+
+
+def migrate(db: Session, batch_size: int) -> int:
+    """Rewrite all plain rows in the compact representation, returning the number converted"""
+    dictionary = compact.active_dictionary(db)
+    converted = 0
+    while True:
+        rows = db.execute(
+            select(URL.short_url, URL.original_url)
+            .where(URL.original_url.is_not(None))
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return converted
+        db.execute(update(URL), [
+            {"short_url": row.short_url, **compact.compact_fields(db, row.original_url, dictionary)}
+            for row in rows
+        ])
+        db.commit()
+        converted += len(rows)
+        logger.info(f"Converted {converted} URLs")
+
+
+def vacuum(bind: Engine) -> None:
+    """Reclaim the space freed by the conversion (SQLite only)"""
+    if bind.dialect.name != "sqlite":
+        return
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM"))
+
+
+def format_bytes(value: Optional[float]) -> str:
+    return "n/a" if value is None else f"{value:,.0f} B"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--train", action="store_true", help="train a dictionary on the stored URLs first")
+    parser.add_argument("--train-sample", type=int, default=50_000)
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards so the file shrinks")
+    parser.add_argument("--sample", type=int, default=1_000, help="short codes timed for lookup cost")
+    args = parser.parse_args()
+
+    upgrade_schema(engine)
+    db = SessionLocal()
+    try:
+        codes = db.execute(select(URL.short_url)).scalars().all()
+        codes = random.Random(SEED).sample(codes, min(args.sample, len(codes)))
+        before = measure(db, engine, codes)
+
+        if args.train:
+            train(db, args.train_sample)
+            compact.clear_caches()
+        converted = migrate(db, args.batch_size)
+        db.close()
+        if args.vacuum:
+            vacuum(engine)
+
+        db = SessionLocal()
+        after = measure(db, engine, codes)
+    finally:
+        db.close()
+
+    print(f"Converted {converted} URLs")
+    print(f"{'':16} {'before':>16} {'after':>16}")
+    print(f"{'database size':16} {format_bytes(before['database_bytes']):>16} {format_bytes(after['database_bytes']):>16}")
+    print(f"{'URL storage':16} {format_bytes(before['url_bytes']):>16} {format_bytes(after['url_bytes']):>16}")
+    print(f"{'lookup cost':16} {before['lookup_us']:>13.1f} us {after['lookup_us']:>13.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,86 @@
 # app/db/models.py
-from sqlalchemy import Column, String, DateTime, Boolean
+from sqlalchemy import Column, String, DateTime, Boolean, Integer, LargeBinary, ForeignKey
+from sqlalchemy.orm import object_session
 from datetime import datetime
+from typing import Optional, cast
 from app.db.base import Base
 
 class URL(Base):
     __tablename__ = "urls"
     
     short_url = Column(String, primary_key=True, index=True)
+    # NULL for rows kept in the compact representation below
     original_url = Column(String, index=True)
     is_custom = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    # Compact representation: interned scheme://host prefix plus compressed path and query
+    domain_id = Column(Integer, ForeignKey("domains.id"), nullable=True)
+    compressed_path = Column(LargeBinary, nullable=True)
+    dictionary_id = Column(Integer, ForeignKey("compression_dictionaries.id"), nullable=True)
+    
+    @property
+    def target_url(self) -> str:
+        """The original URL, decoded from the compact columns if needed"""
+        if self.original_url is not None:
+            return cast(str, self.original_url)
+        from app.services.compact import expand_url
+        db = object_session(self)
+        if db is None:
+            raise RuntimeError(f"Compact URL {self.short_url} is detached from its session")
+        return expand_url(
+            db, cast(int, self.domain_id), cast(bytes, self.compressed_path), cast(Optional[int], self.dictionary_id)
+        )
+
+class Domain(Base):
+    __tablename__ = "domains"
+    
+    id = Column(Integer, primary_key=True)
+    prefix = Column(String, unique=True, nullable=False)
+
+class CompressionDictionary(Base):
+    __tablename__ = "compression_dictionaries"
+    
+    id = Column(Integer, primary_key=True)
+    data = Column(LargeBinary, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+class HourlyClicks(Base):
+    __tablename__ = "clicks_hourly"
+    
+    # The (short_url, bucket) primary key serves the per-link range scans;
+    # the bucket index serves compaction of old hours
+    short_url = Column(String, primary_key=True)
+    bucket = Column(DateTime, primary_key=True, index=True)
+    clicks = Column(Integer, nullable=False, default=0)
+
+class DailyClicks(Base):
+    __tablename__ = "clicks_daily"
+    
+    short_url = Column(String, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    clicks = Column(Integer, nullable=False, default=0)
+
+class LinkCheck(Base):
+    __tablename__ = "link_checks"
+    
+    # Kept out of the urls table so checks never widen the rows redirects read
+    short_url = Column(String, primary_key=True)
+    status_code = Column(Integer, nullable=True)
+    error = Column(String, nullable=True)
+    title = Column(String, nullable=True)
+    checked_at = Column(DateTime, nullable=False)
+    
+    @property
+    def is_dead(self) -> bool:
+        status_code = cast(Optional[int], self.status_code)
+        return status_code is None or status_code >= 400
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    
+    # Shared by every worker so a retry replays wherever it lands
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    short_url = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
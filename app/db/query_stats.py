@@ -0,0 +1,111 @@
+# app/db/query_stats.py
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import get_settings
+from app.core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+class QueryStats:
+    """Database round trips and time spent in the database"""
+
+    def __init__(self):
+        self.queries = 0
+        self.commits = 0
+        self.time_ms = 0.0
+        self.statements: Counter = Counter()
+
+    @property
+    def round_trips(self) -> int:
+        return self.queries + self.commits
+
+    def repeated_statements(self, threshold: int) -> dict:
+        """Statements executed more than `threshold` times, the usual sign of an N+1 pattern"""
+        return {statement: count for statement, count in self.statements.items() if count > threshold}
+
+    def _record_query(self, statement: str, elapsed: float) -> None:
+        self.queries += 1
+        self.time_ms += elapsed * 1000
+        self.statements[statement] += 1
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is not None:
+        stats._record_query(statement, time.perf_counter() - conn.info["query_start"])
+
+
+@event.listens_for(Engine, "commit")
+def _commit(conn):
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.commits += 1
+
+
+@contextmanager
+def count_queries(bind: Engine) -> Iterator[QueryStats]:
+    """Count every round trip made through `bind` inside the block, on any thread"""
+    stats = QueryStats()
+
+    # Listen on the class: listeners added to an engine later are not seen by
+    # connections it has already handed out
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if conn.engine is bind:
+            conn.info["budget_query_start"] = time.perf_counter()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        if conn.engine is bind:
+            stats._record_query(statement, time.perf_counter() - conn.info["budget_query_start"])
+
+    def commit(conn):
+        if conn.engine is bind:
+            stats.commits += 1
+
+    event.listen(Engine, "before_cursor_execute", before)
+    event.listen(Engine, "after_cursor_execute", after)
+    event.listen(Engine, "commit", commit)
+    try:
+        yield stats
+    finally:
+        event.remove(Engine, "before_cursor_execute", before)
+        event.remove(Engine, "after_cursor_execute", after)
+        event.remove(Engine, "commit", commit)
+
+
+async def track_queries(request: Request, call_next):
+    """
+    HTTP middleware counting database round trips per request. In debug mode the
+    counts are returned as X-DB-* response headers.
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        response = await call_next(request)
+    finally:
+        _current_stats.reset(token)
+
+    repeated = stats.repeated_statements(settings.N_PLUS_ONE_THRESHOLD)
+    for statement, count in repeated.items():
+        logger.warning(f"Possible N+1 query on {request.method} {request.url.path}: {count}x {statement}")
+    if settings.DEBUG:
+        response.headers["X-DB-Queries"] = str(stats.queries)
+        response.headers["X-DB-Commits"] = str(stats.commits)
+        response.headers["X-DB-Time-ms"] = f"{stats.time_ms:.3f}"
+    return response
@@ -0,0 +1,36 @@
+# app/db/schema.py
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from app.db.base import Base
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """
+    Create missing tables and add missing nullable columns and indexes to
+    existing ones.
+
+    The project has no migration framework; this keeps databases created by
+    older versions usable after new optional columns are added to a model.
+    """
+    # Make sure every model module is imported so its tables are registered
+    import app.db.models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                logger.info(f"Added column {table.name}.{column.name}")
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+                    logger.info(f"Created index {index.name}")
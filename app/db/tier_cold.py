@@ -0,0 +1,72 @@
+# app/db/tier_cold.py
+"""
+Move cold URLs out of the urls table into segment files now, instead of
+waiting for the background tiering job, and report the table size before and
+after.
+
+Usage:
+    python -m app.db.tier_cold [--cold-after-days 180] [--batch-size 100000] [--vacuum]
+    python -m app.db.tier_cold --merge-only
+
+Requires SEGMENT_DIR.
+"""
+import argparse
+import sys
+from sqlalchemy import func, select
+from app.db.base import SessionLocal, engine
+from app.db.migrate_compact import database_size, format_bytes, vacuum
+from app.db.models import URL
+from app.db.schema import upgrade_schema
+from app.services.segments import segment_store
+from app.services.tiering import merge_segments, run_tiering, tiering_lock
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cold-after-days", type=int, default=settings.TIERING_COLD_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=settings.TIERING_BATCH_SIZE)
+    parser.add_argument("--max-segments", type=int, default=settings.SEGMENT_MAX_COUNT)
+    parser.add_argument("--merge-only", action="store_true", help="only merge existing segments")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards so the file shrinks")
+    args = parser.parse_args()
+
+    if not settings.SEGMENT_DIR:
+        sys.exit("SEGMENT_DIR is not set")
+    upgrade_schema(engine)
+    before = database_size(engine)
+
+    if args.merge_only:
+        # The background job merges under the same lock
+        with tiering_lock(settings.SEGMENT_DIR) as acquired:
+            if not acquired:
+                sys.exit("Tiering is already running in another process; try again later")
+            merge_segments(segment_store, args.max_segments)
+        moved = 0
+    else:
+        db = SessionLocal()
+        try:
+            moved = run_tiering(db, segment_store, args.cold_after_days, args.batch_size, args.max_segments)
+        finally:
+            db.close()
+    if args.vacuum:
+        vacuum(engine)
+
+    db = SessionLocal()
+    try:
+        hot_rows = db.execute(select(func.count()).select_from(URL)).scalar()
+    finally:
+        db.close()
+    segments = segment_store.segments
+    cold_rows = sum(segment.entry_count for segment in segments)
+
+    print(f"Moved {moved} URLs")
+    print(f"{'table rows':16} {hot_rows:>16,}")
+    print(f"{'segment rows':16} {cold_rows:>16,} in {len(segments)} segments")
+    print(f"{'database size':16} {format_bytes(before):>16} -> {format_bytes(database_size(engine))}")
+
+
+if __name__ == "__main__":
+    main()
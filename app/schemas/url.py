@@ -1,6 +1,7 @@
 # app/schemas/url.py
 from pydantic import BaseModel, HttpUrl, Field
 from datetime import datetime
+from typing import List, Literal, Optional
 
 class URLBase(BaseModel):
     target_url: HttpUrl
@@ -13,3 +14,24 @@ class URLInfo(URLBase):
 
     class Config:
         orm_mode = True
+
+class ClickBucket(BaseModel):
+    bucket: datetime
+    clicks: int
+
+class URLStats(BaseModel):
+    short_url: str
+    granularity: Literal["hour", "day"]
+    start: datetime
+    end: datetime
+    total_clicks: int
+    buckets: List[ClickBucket]
+
+class CustomURLAvailability(BaseModel):
+    custom_url: str
+    available: bool
+    reason: Optional[Literal["invalid", "taken"]] = None
+    suggestions: List[str] = []
+
+class CustomURLAvailabilityList(BaseModel):
+    results: List[CustomURLAvailability]
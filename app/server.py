@@ -0,0 +1,328 @@
+# app/server.py
+"""
+Pre-fork production launcher.
+
+The application is imported once in the master process, so every worker
+shares its memory copy-on-write. Workers accept connections on one socket
+bound by the master, or each bind their own SO_REUSEPORT socket so the kernel
+balances connections between them (--reuse-port).
+
+Signals handled by the master:
+    SIGHUP           graceful rolling restart: start fresh workers, then stop the old ones
+    SIGTERM, SIGINT  graceful shutdown
+
+A rolling restart refreshes per-worker state (connection pools, caches) but
+keeps the code imported at startup; restart the master to deploy new code.
+
+Usage:
+    url-shortener --workers 4 --port 8000 --max-requests 10000
+    python -m app.server --workers 4
+"""
+import argparse
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from multiprocessing.sharedctypes import RawArray
+from typing import Dict, List, Optional, Set
+import uvicorn
+from app.core.config import get_settings
+from app.core.logging import setup_logging, get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+HEARTBEAT_INTERVAL = 1.0
+# Exit code of a worker whose application startup (lifespan) failed
+WORKER_STARTUP_FAILED = 3
+# Delay before replacing a worker that failed to start, doubling per failure in a row
+STARTUP_BACKOFF = 1.0
+MAX_STARTUP_BACKOFF = 60.0
+
+
+def default_workers() -> int:
+    """One worker per core available to this process"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def bind_socket(host: str, port: int, reuse_port: bool) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Arbiter:
+    """Master process: forks workers, watches their heartbeats and replaces them"""
+
+    def __init__(
+        self,
+        app,
+        host: str,
+        port: int,
+        workers: int,
+        max_requests: int,
+        max_requests_jitter: int,
+        health_timeout: float,
+        graceful_timeout: float,
+        reuse_port: bool
+    ):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.health_timeout = health_timeout
+        self.graceful_timeout = graceful_timeout
+        self.reuse_port = reuse_port
+        self.socket: Optional[socket.socket] = None
+        # Live worker processes (serving or retiring): pid -> heartbeat slot
+        self.slots: Dict[int, int] = {}
+        # Workers that have not reported a heartbeat since starting: pid -> start time
+        self.starting: Dict[int, float] = {}
+        # Workers serving traffic
+        self.workers: Set[int] = set()
+        # Workers asked to stop: pid -> deadline for a forced kill
+        self.retiring: Dict[int, float] = {}
+        # A rolling restart overlaps old and new workers, and new workers killed for
+        # missing heartbeats keep their slot until reaped while their replacements start
+        self.heartbeats = RawArray("d", workers * 3)
+        self.signals: List[int] = []
+        self.running = True
+        # Worker startup failures in a row, and when the next worker may be started
+        self.startup_failures = 0
+        self.spawn_after = 0.0
+
+    def run(self) -> None:
+        if self.reuse_port:
+            # Bind once up front so a port conflict fails before any fork
+            bind_socket(self.host, self.port, reuse_port=True).close()
+        else:
+            self.socket = bind_socket(self.host, self.port, reuse_port=False)
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda signum, frame: self.signals.append(signum))
+
+        logger.info(f"Master {os.getpid()} listening on {self.host}:{self.port} with {self.num_workers} workers")
+        for _ in range(self.num_workers):
+            self.spawn_worker()
+
+        while self.running:
+            self.handle_signals()
+            self.reap_workers()
+            self.check_health()
+            self.kill_overdue()
+            if self.running:
+                self.spawn_missing()
+            time.sleep(0.2)
+
+        self.shutdown()
+
+    def spawn_missing(self) -> None:
+        """Start workers up to the configured count, unless backing off after startup failures"""
+        if time.monotonic() < self.spawn_after:
+            return
+        while len(self.workers) < self.num_workers:
+            if not self.spawn_worker():
+                break
+
+    def spawn_worker(self) -> bool:
+        """Fork a worker; returns False if every heartbeat slot is still held by a live process"""
+        used = set(self.slots.values())
+        slot = next((i for i in range(len(self.heartbeats)) if i not in used), None)
+        if slot is None:
+            logger.warning("No free heartbeat slot, starting the worker once an old one is reaped")
+            return False
+        # Startup (lifespan) counts against the health timeout too
+        started = time.monotonic()
+        self.heartbeats[slot] = started
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                exit_code = self.run_worker(slot)
+            except Exception:
+                logger.exception("Worker failed")
+            finally:
+                os._exit(exit_code)
+        self.slots[pid] = slot
+        self.starting[pid] = started
+        self.workers.add(pid)
+        logger.info(f"Started worker {pid}")
+        return True
+
+    def run_worker(self, slot: int) -> int:
+        """Body of a forked worker process"""
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)
+        # Forked children would otherwise share the master's random sequence
+        random.seed()
+        # Pooled connections must not be shared across processes
+        from app.db.base import engine
+        engine.dispose(close=False)
+
+        sock = bind_socket(self.host, self.port, reuse_port=True) if self.reuse_port else self.socket
+        if sock is None:
+            raise RuntimeError("No listening socket: run() binds it before forking")
+        heartbeats = self.heartbeats
+
+        async def heartbeat() -> None:
+            # Called from the event loop, so a blocked loop stops the heartbeat
+            heartbeats[slot] = time.monotonic()
+
+        max_requests = None
+        if self.max_requests:
+            max_requests = self.max_requests + random.randint(0, self.max_requests_jitter)
+        config = uvicorn.Config(
+            self.app,
+            lifespan="on",
+            limit_max_requests=max_requests,
+            timeout_graceful_shutdown=int(self.graceful_timeout),
+            callback_notify=heartbeat,
+            timeout_notify=int(HEARTBEAT_INTERVAL),
+            log_level=settings.LOG_LEVEL.lower()
+        )
+        server = uvicorn.Server(config)
+        server.run(sockets=[sock])
+        return 0 if server.started else WORKER_STARTUP_FAILED
+
+    def handle_signals(self) -> None:
+        while self.signals:
+            sig = self.signals.pop(0)
+            if sig == signal.SIGHUP:
+                if self.retiring:
+                    logger.warning("Ignoring SIGHUP, a restart is still in progress")
+                    continue
+                logger.info("Rolling restart of all workers")
+                old = list(self.workers)
+                for _ in old:
+                    if not self.spawn_worker():
+                        break
+                for pid in old:
+                    self.retire(pid)
+            else:
+                logger.info("Shutting down")
+                self.running = False
+
+    def retire(self, pid: int) -> None:
+        """Ask a worker to finish in-flight requests and exit"""
+        self.workers.discard(pid)
+        self.retiring[pid] = time.monotonic() + self.graceful_timeout
+        self.kill(pid, signal.SIGTERM)
+
+    def reap_workers(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            exit_code = os.waitstatus_to_exitcode(status)
+            if pid in self.workers:
+                # Recycled after max requests, or crashed
+                logger.info(f"Worker {pid} exited with status {exit_code}")
+                if exit_code == WORKER_STARTUP_FAILED:
+                    self.startup_failed()
+            self.workers.discard(pid)
+            self.retiring.pop(pid, None)
+            self.slots.pop(pid, None)
+            self.starting.pop(pid, None)
+
+    def startup_failed(self) -> None:
+        """Delay replacements so a worker failing in lifespan is not restarted in a tight loop"""
+        self.startup_failures += 1
+        delay = min(STARTUP_BACKOFF * 2 ** (self.startup_failures - 1), MAX_STARTUP_BACKOFF)
+        self.spawn_after = time.monotonic() + delay
+        logger.error(f"Worker failed to start ({self.startup_failures} in a row), retrying in {delay:.0f}s")
+
+    def check_health(self) -> None:
+        now = time.monotonic()
+        for pid in list(self.workers):
+            heartbeat = self.heartbeats[self.slots[pid]]
+            if pid in self.starting and heartbeat > self.starting[pid]:
+                # Serving: startup succeeded
+                del self.starting[pid]
+                self.startup_failures = 0
+            silence = now - heartbeat
+            if silence > self.health_timeout:
+                logger.error(f"Worker {pid} missed its heartbeat for {silence:.0f}s, killing it")
+                self.workers.discard(pid)
+                self.retiring[pid] = float("inf")
+                self.kill(pid, signal.SIGKILL)
+
+    def kill_overdue(self) -> None:
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if now > deadline:
+                logger.warning(f"Worker {pid} did not stop within {self.graceful_timeout}s, killing it")
+                self.kill(pid, signal.SIGKILL)
+                self.retiring[pid] = float("inf")
+
+    def shutdown(self) -> None:
+        for pid in list(self.workers):
+            self.retire(pid)
+        while self.retiring:
+            self.reap_workers()
+            self.kill_overdue()
+            time.sleep(0.1)
+        logger.info("All workers stopped")
+
+    @staticmethod
+    def kill(pid: int, sig: int) -> None:
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS or default_workers())
+    parser.add_argument("--max-requests", type=int, default=settings.WORKER_MAX_REQUESTS,
+                        help="recycle a worker after this many requests (0 disables)")
+    parser.add_argument("--max-requests-jitter", type=int, default=settings.WORKER_MAX_REQUESTS_JITTER,
+                        help="random extra requests per worker so they do not all recycle together")
+    parser.add_argument("--health-timeout", type=float, default=settings.WORKER_HEALTH_TIMEOUT)
+    parser.add_argument("--graceful-timeout", type=float, default=settings.WORKER_GRACEFUL_TIMEOUT)
+    parser.add_argument("--reuse-port", action="store_true", default=settings.SERVER_REUSE_PORT,
+                        help="give every worker its own SO_REUSEPORT socket")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    # Import before forking so the application is shared copy-on-write
+    from main import app
+    from app.db.base import engine
+    from app.db.schema import upgrade_schema
+
+    # Upgrade the schema once here; workers starting together would race on it
+    upgrade_schema(engine)
+    engine.dispose()
+
+    Arbiter(
+        app,
+        host=args.host,
+        port=args.port,
+        workers=max(args.workers, 1),
+        max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter,
+        health_timeout=args.health_timeout,
+        graceful_timeout=args.graceful_timeout,
+        reuse_port=args.reuse_port
+    ).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+# app/services/analytics.py
+"""
+Click analytics kept as incremental time-bucketed rollups.
+
+Redirects only bump an in-memory counter keyed by (short code, hour). A
+background task periodically adds those counts to the hourly rollup table with
+one upsert per batch, and compacts hourly buckets older than the retention
+window into the daily table. Stats are answered from the rollups alone; raw
+click events are never stored.
+"""
+import asyncio
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.core.circuit_breaker import CircuitOpenError
+from app.core.metrics import Counter as MetricCounter, Gauge
+from app.db.base import UPSERT_INSERT, db_breaker
+from app.db.models import HourlyClicks, DailyClicks
+from .shortener import service_unavailable
+from ..core.config import get_settings
+from ..core.logging import get_logger
+from ..core.profiling import phase
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+HOUR = "hour"
+DAY = "day"
+GRANULARITY_STEP = {HOUR: timedelta(hours=1), DAY: timedelta(days=1)}
+
+BucketKey = Tuple[str, datetime]
+
+
+def hour_bucket(when: datetime) -> datetime:
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(when: datetime) -> datetime:
+    return when.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def floor_bucket(when: datetime, granularity: str) -> datetime:
+    return hour_bucket(when) if granularity == HOUR else day_bucket(when)
+
+
+class ClickBuffer:
+    """Click counts per (short code, hour) not yet written to the rollup tables"""
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self._counts: Counter = Counter()
+        # Redirects record from the event loop, flushes drain from a worker thread
+        self._lock = threading.Lock()
+
+    def record(self, short_url: str, when: Optional[datetime] = None) -> None:
+        key = (short_url, hour_bucket(when or datetime.utcnow()))
+        with self._lock:
+            if key not in self._counts and len(self._counts) >= self.max_pending:
+                # The database has been unreachable for a while; shed instead of growing
+                clicks_dropped.inc()
+                return
+            self._counts[key] += 1
+
+    def drain(self) -> Dict[BucketKey, int]:
+        """Take every pending count, leaving the buffer empty"""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        return counts
+
+    def restore(self, counts: Dict[BucketKey, int]) -> None:
+        """Put back counts whose flush failed"""
+        with self._lock:
+            self._counts.update(counts)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+
+click_buffer = ClickBuffer(settings.ANALYTICS_MAX_PENDING)
+pending_buckets = Gauge("analytics_pending_buckets", "Click buckets waiting to be flushed", function=lambda: len(click_buffer))
+clicks_flushed = MetricCounter("analytics_clicks_flushed_total", "Clicks written to the hourly rollups")
+clicks_dropped = MetricCounter("analytics_clicks_dropped_total", "Clicks dropped because the buffer was full")
+
+
+def add_clicks(db: Session, model, counts: Dict[BucketKey, int]) -> None:
+    """Add counts to existing rollup rows, creating missing ones, in one statement"""
+    if not counts:
+        return
+    insert = UPSERT_INSERT[db.get_bind().dialect.name]
+    stmt = insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[model.short_url, model.bucket],
+        set_={"clicks": model.clicks + stmt.excluded.clicks}
+    )
+    db.execute(stmt, [
+        {"short_url": short_url, "bucket": bucket, "clicks": clicks}
+        for (short_url, bucket), clicks in counts.items()
+    ])
+
+
+def flush_clicks(db: Session, buffer: ClickBuffer = click_buffer) -> int:
+    """Write buffered clicks to the hourly rollups, returning the number of clicks written"""
+    counts = buffer.drain()
+    if not counts:
+        return 0
+    try:
+        add_clicks(db, HourlyClicks, counts)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        buffer.restore(counts)
+        logger.warning(f"Failed to flush {len(counts)} click buckets, will retry: {str(e)}")
+        return 0
+    total = sum(counts.values())
+    clicks_flushed.inc(total)
+    logger.debug(f"Flushed {total} clicks in {len(counts)} buckets")
+    return total
+
+
+def compact_rollups(db: Session, before: datetime) -> int:
+    """
+    Fold hourly buckets from days before `before` into daily buckets, returning
+    the number of hourly rows compacted.
+    """
+    cutoff = day_bucket(before)
+    # Delete and read in one statement so clicks flushed concurrently are not lost
+    rows = db.execute(
+        delete(HourlyClicks)
+        .where(HourlyClicks.bucket < cutoff)
+        .returning(HourlyClicks.short_url, HourlyClicks.bucket, HourlyClicks.clicks)
+    ).all()
+    daily: Counter = Counter()
+    for short_url, bucket, clicks in rows:
+        daily[(short_url, day_bucket(bucket))] += clicks
+    add_clicks(db, DailyClicks, daily)
+    db.commit()
+    if rows:
+        logger.info(f"Compacted {len(rows)} hourly click buckets into {len(daily)} daily buckets")
+    return len(rows)
+
+
+def get_click_buckets(
+    db: Session,
+    short_url: str,
+    granularity: str,
+    start: datetime,
+    end: datetime
+) -> List[Tuple[datetime, int]]:
+    """Non-empty (bucket, clicks) pairs for buckets starting in [start, end), oldest first"""
+    try:
+        with db_breaker.call(), phase("db_query"):
+            return _query_click_buckets(db, short_url, granularity, start, end)
+    except CircuitOpenError as e:
+        raise service_unavailable(e.retry_after)
+    except db_breaker.failure_exceptions as e:
+        logger.error(f"Database unavailable while reading stats for {short_url}: {str(e)}")
+        raise service_unavailable(db_breaker.retry_after())
+
+
+def _query_click_buckets(
+    db: Session,
+    short_url: str,
+    granularity: str,
+    start: datetime,
+    end: datetime
+) -> List[Tuple[datetime, int]]:
+    hourly = db.execute(
+        select(HourlyClicks.bucket, HourlyClicks.clicks)
+        .where(HourlyClicks.short_url == short_url, HourlyClicks.bucket >= start, HourlyClicks.bucket < end)
+        .order_by(HourlyClicks.bucket)
+    ).all()
+    if granularity == HOUR:
+        # Hours older than the retention window only survive as daily buckets
+        return [(bucket, clicks) for bucket, clicks in hourly]
+
+    buckets: Counter = Counter()
+    daily = db.execute(
+        select(DailyClicks.bucket, DailyClicks.clicks)
+        .where(DailyClicks.short_url == short_url, DailyClicks.bucket >= start, DailyClicks.bucket < end)
+    ).all()
+    for bucket, clicks in daily:
+        buckets[bucket] += clicks
+    # Recent days are still held as hours
+    for bucket, clicks in hourly:
+        buckets[day_bucket(bucket)] += clicks
+    return sorted(buckets.items())
+
+
+def run_rollup_cycle(session_factory, compact: bool) -> None:
+    """Flush pending clicks and, if asked, compact hours past the retention window"""
+    db = session_factory()
+    try:
+        flush_clicks(db)
+        if compact:
+            retention = timedelta(days=settings.ANALYTICS_HOURLY_RETENTION_DAYS)
+            compact_rollups(db, datetime.utcnow() - retention)
+    finally:
+        db.close()
+
+
+async def run_analytics_worker(session_factory, interval: float) -> None:
+    """Periodically flush clicks, and compact once an hour, until cancelled"""
+    last_compaction = float("-inf")
+    while True:
+        await asyncio.sleep(interval)
+        compact = time.monotonic() - last_compaction >= 3600
+        try:
+            await asyncio.to_thread(run_rollup_cycle, session_factory, compact)
+        except SQLAlchemyError as e:
+            logger.error(f"Analytics rollup failed: {str(e)}")
+            continue
+        if compact:
+            last_compaction = time.monotonic()
@@ -0,0 +1,75 @@
+# app/services/cache.py
+import heapq
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from ..core.config import get_settings
+from ..core.logging import get_logger
+from ..core.metrics import Gauge
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+class URLCache:
+    """Bounded LRU of short code -> original URL that also counts hits per entry"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # short code -> [original_url, hits]
+        self._entries: "OrderedDict[str, List]" = OrderedDict()
+        # Snapshot writes run in a worker thread
+        self._lock = threading.Lock()
+
+    def get(self, short_url: str) -> Optional[str]:
+        """Return the cached URL and count the hit, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(short_url)
+            if entry is None:
+                return None
+            entry[1] += 1
+            self._entries.move_to_end(short_url)
+            return entry[0]
+
+    def put(self, short_url: str, original_url: str, hits: int = 0) -> None:
+        """Insert or refresh an entry, evicting the least recently used past max_entries"""
+        with self._lock:
+            entry = self._entries.get(short_url)
+            if entry is not None:
+                entry[0] = original_url
+                self._entries.move_to_end(short_url)
+                return
+            self._entries[short_url] = [original_url, hits]
+            self._evict()
+
+    def put_if_absent(self, short_url: str, original_url: str, hits: int = 0) -> bool:
+        """Insert an entry only if it is not cached yet, without refreshing recency"""
+        with self._lock:
+            if short_url in self._entries or len(self._entries) >= self.max_entries:
+                return False
+            self._entries[short_url] = [original_url, hits]
+            # Warm entries start cold so live traffic is never evicted for them
+            self._entries.move_to_end(short_url, last=False)
+            return True
+
+    def hottest(self, n: int) -> List[Tuple[str, str, int]]:
+        """Return up to n (short_url, original_url, hits) entries with the most hits"""
+        with self._lock:
+            items = [(code, entry[0], entry[1]) for code, entry in self._entries.items()]
+        return heapq.nlargest(n, items, key=lambda item: item[2])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+url_cache = URLCache(settings.CACHE_MAX_ENTRIES)
+
+cache_entries = Gauge("url_cache_entries", "Short codes held in the lookup cache", function=lambda: len(url_cache))
@@ -0,0 +1,148 @@
+# app/services/code_index.py
+"""
+In-memory sorted index of every short code in use, for availability checks and
+custom code suggestions without a database round trip per candidate.
+
+The index is a large sorted list plus a small sorted list of codes added since
+the last compaction, so an insert never shifts the large list. Codes created in
+this process are added as they are committed; codes created by other worker
+processes are picked up by a periodic refresh that reads rows created since the
+newest row already seen. Codes are never removed: tiered URLs keep their codes
+in segment files. The index is advisory: the primary key still decides a create.
+"""
+import asyncio
+import bisect
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.core.metrics import Gauge
+from app.db.models import URL
+from .segments import SegmentStore
+from ..core.config import get_settings
+from ..core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Rows are stamped before they commit, so refreshes re-read a window before the watermark
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+
+def _contains(codes: List[str], code: str) -> bool:
+    i = bisect.bisect_left(codes, code)
+    return i < len(codes) and codes[i] == code
+
+
+def _unique(codes: Iterable[str]) -> Iterator[str]:
+    previous = None
+    for code in codes:
+        if code != previous:
+            yield code
+            previous = code
+
+
+class CodeIndex:
+    """Sorted short codes with cheap inserts and O(log n) membership"""
+
+    def __init__(self, merge_threshold: int):
+        self.merge_threshold = merge_threshold
+        self._codes: List[str] = []
+        self._recent: List[str] = []
+        self._lock = threading.Lock()
+        self.watermark: Optional[datetime] = None
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._codes) + len(self._recent)
+
+    def __contains__(self, code: str) -> bool:
+        with self._lock:
+            return _contains(self._codes, code) or _contains(self._recent, code)
+
+    def add(self, code: str) -> bool:
+        """Record a code in use, returning False if it was already indexed"""
+        if not self.ready:
+            return False
+        with self._lock:
+            if _contains(self._codes, code) or _contains(self._recent, code):
+                return False
+            bisect.insort(self._recent, code)
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._codes = []
+            self._recent = []
+            self.watermark = None
+            self.ready = False
+
+    def load(self, db: Session, store: SegmentStore) -> int:
+        """Build the index from the urls table and every segment, returning its size"""
+        watermark = db.execute(select(func.max(URL.created_at))).scalar()
+        table_codes = db.execute(select(URL.short_url)).scalars()
+        cold_codes = (entry.short_url for segment in store.segments for entry in segment)
+        # Sorted here rather than by the database, whose collation may not match Python's
+        codes = list(_unique(sorted(itertools.chain(table_codes, cold_codes))))
+        with self._lock:
+            # Codes committed while loading are picked up by the first refresh
+            self._codes, self._recent = codes, []
+            self.watermark = watermark
+            self.ready = True
+        logger.info(f"Loaded {len(codes)} short codes into the code index")
+        return len(codes)
+
+    def refresh(self, db: Session) -> int:
+        """Add codes created by other processes since the watermark, returning how many were new"""
+        if not self.ready:
+            return 0
+        query = select(URL.short_url, URL.created_at)
+        if self.watermark is not None:
+            query = query.where(URL.created_at >= self.watermark - REFRESH_OVERLAP)
+        added = 0
+        for code, created_at in db.execute(query).all():
+            added += self.add(code)
+            if created_at is not None and (self.watermark is None or created_at > self.watermark):
+                self.watermark = created_at
+        if len(self._recent) >= self.merge_threshold:
+            self.compact()
+        return added
+
+    def compact(self) -> None:
+        """Merge recently added codes into the large list, off the lock"""
+        with self._lock:
+            codes, recent = self._codes, list(self._recent)
+        merged = list(heapq.merge(codes, recent))
+        with self._lock:
+            self._recent = [code for code in self._recent if not _contains(merged, code)]
+            self._codes = merged
+        logger.debug(f"Compacted {len(recent)} recent codes into the code index")
+
+
+def _refresh_job(session_factory, store: SegmentStore) -> None:
+    db = session_factory()
+    try:
+        if code_index.ready:
+            code_index.refresh(db)
+        else:
+            code_index.load(db, store)
+    finally:
+        db.close()
+
+
+async def run_code_index_worker(session_factory, store: SegmentStore, interval: float) -> None:
+    """Load the index, then keep it in step with other processes until cancelled"""
+    while True:
+        try:
+            await asyncio.to_thread(_refresh_job, session_factory, store)
+        except (SQLAlchemyError, OSError) as e:
+            logger.error(f"Code index refresh failed: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+code_index = CodeIndex(merge_threshold=settings.CODE_INDEX_MERGE_THRESHOLD)
+index_codes = Gauge("code_index_codes", "Short codes held in the availability index", function=lambda: len(code_index))
@@ -0,0 +1,199 @@
+# app/services/compact.py
+"""
+Compact storage of target URLs.
+
+A URL is split into its scheme://host prefix, interned once in the `domains`
+table, and the remaining path and query. The remainder is raw-deflate
+compressed with a preset dictionary of common URL fragments; a dictionary
+trained on the actual corpus can be stored in `compression_dictionaries` by the
+migration tool (`python -m app.db.migrate_compact`).
+
+Encoded remainder layout: one tag byte (RAW or DEFLATE) followed by the data.
+"""
+import re
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple, cast
+from urllib.parse import urlsplit
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.db.models import CompressionDictionary, Domain
+from ..core.config import get_settings
+from ..core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+RAW = 0
+DEFLATE = 1
+
+# Used while no trained dictionary exists. Deflate finds matches anywhere in the
+# dictionary, but the most common fragments go last, where match distances are shortest.
+DEFAULT_DICTIONARY = (
+    b"/index.html/index.php.html.php.aspx/search?q=/product/products/category/"
+    b"/blog/news/article/articles/post/posts/watch?v=/p/id=&id=?id=page=&page="
+    b"ref=&ref=?ref=lang=en&lang=en-US&sort=&fbclid=&gclid="
+    b"utm_content=&utm_term=&utm_campaign=&utm_medium=email&utm_medium=social"
+    b"&utm_medium=?utm_source=newsletter&utm_source="
+)
+
+# Whole path segments and key=value pairs, plus bare query keys for varying values
+TOKEN_PATTERNS = (re.compile(r'[/?&#][^/?&#]*'), re.compile(r'[?&][^?&#=]*='))
+
+_domain_ids: Dict[str, int] = {}
+_domain_prefixes: Dict[int, str] = {}
+_dictionaries: Dict[int, bytes] = {}
+_active_dictionary: Optional[Tuple[Optional[int], bytes]] = None
+_lock = threading.Lock()
+
+
+def split_url(url: str) -> Tuple[str, str]:
+    """Split a URL into its scheme://host prefix and the remaining path, query and fragment"""
+    parts = urlsplit(url)
+    prefix = f"{parts.scheme}://{parts.netloc}"
+    return prefix, url[len(prefix):]
+
+
+def encode_path(rest: str, dictionary: bytes) -> bytes:
+    """Compress a path and query, falling back to raw bytes when that is shorter"""
+    raw = rest.encode()
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, dictionary)
+    compressed = compressor.compress(raw) + compressor.flush()
+    if len(compressed) < len(raw):
+        return bytes([DEFLATE]) + compressed
+    return bytes([RAW]) + raw
+
+
+def decode_path(blob: bytes, dictionary: bytes) -> str:
+    """Reverse encode_path"""
+    if blob[0] == RAW:
+        return blob[1:].decode()
+    decompressor = zlib.decompressobj(-15, dictionary)
+    return (decompressor.decompress(blob[1:]) + decompressor.flush()).decode()
+
+
+def train_dictionary(urls: Iterable[str], max_size: int = 16384, min_count: int = 2) -> bytes:
+    """Build a preset dictionary from the most common path and query fragments of a corpus"""
+    counts: Counter = Counter()
+    for url in urls:
+        rest = split_url(url)[1]
+        for pattern in TOKEN_PATTERNS:
+            counts.update(pattern.findall(rest))
+    # Weight by bytes saved, not just frequency
+    ranked = sorted(
+        (token for token, count in counts.items() if count >= min_count),
+        key=lambda token: counts[token] * len(token),
+        reverse=True
+    )
+    chosen = []
+    size = 0
+    for token in ranked:
+        encoded = token.encode()
+        if size + len(encoded) > max_size:
+            break
+        chosen.append(encoded)
+        size += len(encoded)
+    # Most valuable fragments last
+    return b"".join(reversed(chosen)) or DEFAULT_DICTIONARY
+
+
+def get_dictionary(db: Session, dictionary_id: Optional[int]) -> bytes:
+    """Return a stored dictionary by id, or the built-in one for None"""
+    if dictionary_id is None:
+        return DEFAULT_DICTIONARY
+    dictionary = _dictionaries.get(dictionary_id)
+    if dictionary is None:
+        dictionary = db.execute(
+            select(CompressionDictionary.data).where(CompressionDictionary.id == dictionary_id)
+        ).scalar_one()
+        with _lock:
+            _dictionaries[dictionary_id] = dictionary
+    return dictionary
+
+
+def active_dictionary(db: Session) -> Tuple[Optional[int], bytes]:
+    """
+    Return the newest stored dictionary, or the built-in one if none was trained.
+
+    Looked up once per process; workers pick up a newly trained dictionary on restart.
+    """
+    global _active_dictionary
+    if _active_dictionary is None:
+        row = db.execute(
+            select(CompressionDictionary.id, CompressionDictionary.data)
+            .order_by(CompressionDictionary.id.desc())
+            .limit(1)
+        ).first()
+        with _lock:
+            if row is None:
+                _active_dictionary = (None, DEFAULT_DICTIONARY)
+            else:
+                _dictionaries[row.id] = row.data
+                _active_dictionary = (row.id, row.data)
+    return _active_dictionary
+
+
+def intern_domain(db: Session, prefix: str) -> int:
+    """Return the id of a domain prefix, inserting it on first use"""
+    domain_id = _domain_ids.get(prefix)
+    if domain_id is not None:
+        return domain_id
+    domain_id = db.execute(select(Domain.id).where(Domain.prefix == prefix)).scalar()
+    if domain_id is None:
+        try:
+            # Another worker may insert the same prefix concurrently
+            with db.begin_nested():
+                domain = Domain(prefix=prefix)
+                db.add(domain)
+                db.flush()
+            # Not cached until a later lookup sees it committed, since the
+            # surrounding transaction may still roll back
+            return cast(int, domain.id)
+        except IntegrityError:
+            domain_id = db.execute(select(Domain.id).where(Domain.prefix == prefix)).scalar_one()
+    _remember_domain(domain_id, prefix)
+    return domain_id
+
+
+def domain_prefix(db: Session, domain_id: int) -> str:
+    """Return the prefix of an interned domain"""
+    prefix = _domain_prefixes.get(domain_id)
+    if prefix is None:
+        prefix = db.execute(select(Domain.prefix).where(Domain.id == domain_id)).scalar_one()
+        _remember_domain(domain_id, prefix)
+    return prefix
+
+
+def compact_fields(db: Session, url: str, dictionary: Optional[Tuple[Optional[int], bytes]] = None) -> dict:
+    """Return the column values storing url in the compact representation"""
+    dictionary_id, data = dictionary or active_dictionary(db)
+    prefix, rest = split_url(url)
+    return {
+        "original_url": None,
+        "domain_id": intern_domain(db, prefix),
+        "compressed_path": encode_path(rest, data),
+        "dictionary_id": dictionary_id,
+    }
+
+
+def expand_url(db: Session, domain_id: int, compressed_path: bytes, dictionary_id: Optional[int]) -> str:
+    """Rebuild a URL stored in the compact representation"""
+    return domain_prefix(db, domain_id) + decode_path(compressed_path, get_dictionary(db, dictionary_id))
+
+
+def clear_caches() -> None:
+    """Forget cached domains and dictionaries (e.g. after a rolled back transaction)"""
+    global _active_dictionary
+    with _lock:
+        _active_dictionary = None
+        _domain_ids.clear()
+        _domain_prefixes.clear()
+        _dictionaries.clear()
+
+
+def _remember_domain(domain_id: int, prefix: str) -> None:
+    with _lock:
+        _domain_ids[prefix] = domain_id
+        _domain_prefixes[domain_id] = prefix
@@ -0,0 +1,173 @@
+# app/services/idempotency.py
+"""
+Idempotency keys for retried creates.
+
+A create carrying an Idempotency-Key commits a row mapping the key to the
+request fingerprint and the short code, in the same transaction as the URL.
+For IDEMPOTENCY_TTL seconds, a retry on any worker replays that URL instead of
+creating again. Each worker also keeps recent results in memory, so a retry
+landing on the same worker replays without touching the database, and
+requests arriving with a key that is still executing there wait for that
+execution. A key reused with a different request body is refused. Failures
+are not stored, so a retry after an error runs again.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, cast
+from fastapi import HTTPException
+from sqlalchemy import delete
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.db.models import URL, IdempotencyKey
+from ..core.config import get_settings
+from ..core.logging import get_logger
+from ..core.metrics import Counter, Gauge
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(body: str) -> str:
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def key_reused() -> HTTPException:
+    return HTTPException(
+        status_code=422,
+        detail="Idempotency-Key was already used with a different request"
+    )
+
+
+def find_idempotent_create(db: Session, key: str, fingerprint: str) -> Optional[URL]:
+    """The URL an earlier request with this key created, or None if the key is unused or expired"""
+    row = db.get(IdempotencyKey, key)
+    if row is None:
+        return None
+    if cast(datetime, row.created_at) < datetime.utcnow() - timedelta(seconds=settings.IDEMPOTENCY_TTL):
+        # Not purged yet; removed in the transaction of the create reusing the key
+        db.delete(row)
+        db.flush()
+        return None
+    if cast(str, row.fingerprint) != fingerprint:
+        raise key_reused()
+    return db.query(URL).filter(URL.short_url == row.short_url).first()
+
+
+def purge_idempotency_keys(db: Session, before: datetime) -> int:
+    """Delete keys created before `before`, returning how many were removed"""
+    result = db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < before))
+    db.commit()
+    return result.rowcount
+
+
+def _purge_job(session_factory) -> None:
+    db = session_factory()
+    try:
+        purged = purge_idempotency_keys(db, datetime.utcnow() - timedelta(seconds=settings.IDEMPOTENCY_TTL))
+        if purged:
+            logger.debug(f"Purged {purged} expired idempotency keys")
+    finally:
+        db.close()
+
+
+async def run_idempotency_cleanup(session_factory, interval: float) -> None:
+    """Periodically delete expired idempotency keys until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(_purge_job, session_factory)
+        except SQLAlchemyError as e:
+            logger.error(f"Idempotency key cleanup failed: {str(e)}")
+
+
+class IdempotencyStore:
+    """Per-worker bounded store of key -> (fingerprint, result), evicted after a fixed TTL"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (expires_at, fingerprint, result); insertion order is expiry order
+        self._entries: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+        # key -> (fingerprint, future of the running execution)
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, fingerprint: str) -> Optional[Any]:
+        """The stored result for key, or None; raises 422 if key was used for another request"""
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] != fingerprint:
+            raise key_reused()
+        return entry[2]
+
+    def put(self, key: str, fingerprint: str, result: Any) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, fingerprint, result)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def run(self, key: str, fingerprint: str, execute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Return (result, replayed). The stored or in-flight result for key is
+        reused; otherwise execute() runs and a successful result is stored.
+        """
+        result = self.get(key, fingerprint)
+        if result is not None:
+            replays.inc(source="stored")
+            return result, True
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            if inflight[0] != fingerprint:
+                raise key_reused()
+            replays.inc(source="inflight")
+            # A cancelled waiter must not cancel the execution it is waiting for
+            return await asyncio.shield(inflight[1]), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (fingerprint, future)
+        try:
+            result = await execute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark it retrieved: with no waiters asyncio would log it as never retrieved
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+        self.put(key, fingerprint, result)
+        future.set_result(result)
+        return result, False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._entries:
+            key, (expires_at, _, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[key]
+
+
+idempotency_store = IdempotencyStore(settings.IDEMPOTENCY_MAX_KEYS, settings.IDEMPOTENCY_TTL)
+
+replays = Counter("idempotent_replays_total", "Requests answered from an earlier execution with the same Idempotency-Key")
+stored_keys = Gauge("idempotency_keys", "Idempotency keys with a stored result", function=lambda: len(idempotency_store))
@@ -0,0 +1,324 @@
+# app/services/link_checker.py
+"""
+Background checks of target URLs: is the target alive, and what is its page title.
+
+Creates only enqueue (short code, target URL). The backlog is bounded and kept
+as one FIFO per host; a dispatcher starts checks round-robin across hosts while
+a global slot count and a per-host limit are respected. A slow or hanging host
+therefore ties up at most LINK_CHECK_PER_HOST slots and other hosts keep
+moving. Results are upserted into link_checks in batches.
+"""
+import asyncio
+import codecs
+import html
+import ipaddress
+import re
+import socket
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Deque, Dict, List, NamedTuple, Optional, Set
+from urllib.parse import urlsplit
+import httpx
+from sqlalchemy.exc import SQLAlchemyError
+from app.core.metrics import Counter, Gauge
+from app.db.base import UPSERT_INSERT
+from app.db.models import LinkCheck
+from ..core.config import get_settings
+from ..core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+MAX_REDIRECTS = 5
+MAX_TITLE_LENGTH = 300
+USER_AGENT = "url-shortener-link-checker/1.0"
+TITLE_PATTERN = re.compile(rb"<title[^>]*>(.*?)</title", re.IGNORECASE | re.DOTALL)
+
+
+class CheckTask(NamedTuple):
+    short_url: str
+    target_url: str
+
+
+class CheckResult(NamedTuple):
+    short_url: str
+    status_code: Optional[int]
+    error: Optional[str]
+    title: Optional[str]
+    checked_at: datetime
+
+
+class BlockedAddressError(Exception):
+    """The target resolves to an address the checker must not contact"""
+
+
+def extract_title(body: bytes, encoding: Optional[str]) -> Optional[str]:
+    match = TITLE_PATTERN.search(body)
+    if not match:
+        return None
+    try:
+        codecs.lookup(encoding or "utf-8")
+    except LookupError:
+        # Pages declare charsets Python does not know
+        encoding = None
+    title = html.unescape(match.group(1).decode(encoding or "utf-8", errors="replace"))
+    title = " ".join(title.split())
+    return title[:MAX_TITLE_LENGTH] or None
+
+
+async def resolve_address(host: str) -> str:
+    """
+    The address a check of host connects to. Hosts resolving to loopback,
+    private, link-local or reserved addresses are refused.
+    """
+    infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    addresses = [ipaddress.ip_address(info[4][0]) for info in infos]
+    if not settings.LINK_CHECK_ALLOW_PRIVATE:
+        for address in addresses:
+            if not address.is_global:
+                raise BlockedAddressError(f"{host} resolves to non-public address {address}")
+    return str(addresses[0])
+
+
+class LinkChecker:
+    """Bounded, per-host fair pipeline of target URL checks"""
+
+    def __init__(
+        self,
+        queue_size: int,
+        concurrency: int,
+        per_host: int,
+        timeout: float,
+        max_bytes: int,
+        batch_size: int,
+        flush_interval: float
+    ):
+        self.queue_size = queue_size
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    @property
+    def backlog(self) -> int:
+        return self._backlog if self.running else 0
+
+    async def start(self, session_factory) -> None:
+        self._session_factory = session_factory
+        # Hosts with waiting checks, in round-robin order
+        self._pending: "OrderedDict[str, Deque[CheckTask]]" = OrderedDict()
+        self._active: Dict[str, int] = {}
+        self._backlog = 0
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._wakeup = asyncio.Event()
+        self._results: List[CheckResult] = []
+        self._results_ready = asyncio.Event()
+        self._checks: Set[asyncio.Task] = set()
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            headers={"User-Agent": USER_AGENT, "Accept": "text/html,*/*;q=0.5"},
+            follow_redirects=False,
+            # Proxies from the environment would make the connection, bypassing the address check
+            trust_env=False
+        )
+        self._loop = asyncio.get_running_loop()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        self._writer = asyncio.create_task(self._write_loop())
+        logger.info(f"Link checker started ({self.concurrency} slots, {self.per_host} per host)")
+
+    async def stop(self) -> None:
+        """Cancel outstanding checks and write the results collected so far"""
+        if not self.running:
+            return
+        self._loop = None
+        self._dispatcher.cancel()
+        self._writer.cancel()
+        for task in list(self._checks):
+            task.cancel()
+        await asyncio.gather(self._dispatcher, self._writer, *self._checks, return_exceptions=True)
+        await asyncio.to_thread(self._write_results, self._take_results())
+        await self._client.aclose()
+        logger.info("Link checker stopped")
+
+    def submit(self, short_url: str, target_url: str) -> bool:
+        """Queue a check; returns False when the checker is not running or the backlog is full"""
+        loop = self._loop
+        if loop is None:
+            return False
+        try:
+            in_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            in_loop = False
+        if not in_loop:
+            loop.call_soon_threadsafe(self._enqueue, CheckTask(short_url, target_url))
+            return True
+        return self._enqueue(CheckTask(short_url, target_url))
+
+    def _enqueue(self, task: CheckTask) -> bool:
+        if not self.running:
+            return False
+        if self._backlog >= self.queue_size:
+            checks_dropped.inc()
+            logger.warning(f"Link check backlog full, skipping {task.short_url}")
+            return False
+        host = urlsplit(task.target_url).hostname or ""
+        self._pending.setdefault(host, deque()).append(task)
+        self._backlog += 1
+        self._wakeup.set()
+        return True
+
+    def _next_host(self) -> Optional[str]:
+        """First host in round-robin order that has work and a free per-host slot"""
+        for host in self._pending:
+            if self._active.get(host, 0) < self.per_host:
+                self._pending.move_to_end(host)
+                return host
+        return None
+
+    async def _dispatch(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while True:
+                host = self._next_host()
+                if host is None:
+                    break
+                await self._slots.acquire()
+                queue = self._pending[host]
+                task = queue.popleft()
+                if not queue:
+                    del self._pending[host]
+                self._backlog -= 1
+                self._active[host] = self._active.get(host, 0) + 1
+                check = asyncio.create_task(self._run(host, task))
+                self._checks.add(check)
+                check.add_done_callback(self._checks.discard)
+
+    async def _run(self, host: str, task: CheckTask) -> None:
+        try:
+            result = await self.check(task)
+            self._results.append(result)
+            if result.status_code is None:
+                checks_total.inc(result="error")
+            else:
+                checks_total.inc(result="dead" if result.status_code >= 400 else "alive")
+            if len(self._results) >= self.batch_size:
+                self._results_ready.set()
+        finally:
+            self._active[host] -= 1
+            if not self._active[host]:
+                del self._active[host]
+            self._slots.release()
+            self._wakeup.set()
+
+    async def check(self, task: CheckTask) -> CheckResult:
+        """Fetch the target; every failure is recorded as an error so each check stores a result"""
+        try:
+            status_code, title = await asyncio.wait_for(self._fetch(task.target_url), self.timeout * 2)
+            error = None
+        except asyncio.TimeoutError:
+            status_code, title, error = None, None, "timeout"
+        except BlockedAddressError:
+            status_code, title, error = None, None, "blocked_address"
+        except Exception as e:
+            # Transport errors, invalid URLs, undecodable host names, ...
+            status_code, title, error = None, None, type(e).__name__
+        return CheckResult(task.short_url, status_code, error, title, datetime.utcnow())
+
+    async def _fetch(self, url: str):
+        """Follow redirects by hand so every hop is resolved and vetted"""
+        request = self._client.build_request("GET", url)
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await self._send_pinned(request)
+            try:
+                if not response.is_redirect:
+                    return response.status_code, await self._read_title(response)
+            finally:
+                await response.aclose()
+            request = self._client.build_request("GET", request.url.join(response.headers["location"]))
+        raise httpx.TooManyRedirects("Too many redirects", request=request)
+
+    async def _send_pinned(self, request: httpx.Request) -> httpx.Response:
+        """
+        Connect to the vetted address itself. Letting httpx resolve the host
+        again would let a second DNS answer (rebinding) reach another address.
+        """
+        host = request.url.host
+        address = await resolve_address(host)
+        pinned = httpx.Request(
+            request.method,
+            request.url.copy_with(host=address),
+            # The Host header and TLS server name (and certificate check) keep the original host
+            headers=request.headers,
+            extensions={**request.extensions, "sni_hostname": host}
+        )
+        return await self._client.send(pinned, stream=True)
+
+    async def _read_title(self, response: httpx.Response) -> Optional[str]:
+        if response.status_code >= 400 or "html" not in response.headers.get("content-type", ""):
+            return None
+        # The title is near the top; never download whole pages
+        body = b""
+        async for chunk in response.aiter_bytes():
+            body += chunk
+            if len(body) >= self.max_bytes or b"</title" in body.lower():
+                break
+        return extract_title(body[:self.max_bytes], response.charset_encoding)
+
+    def _take_results(self) -> List[CheckResult]:
+        results, self._results = self._results, []
+        self._results_ready.clear()
+        return results
+
+    async def _write_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._results_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            results = self._take_results()
+            if results:
+                await asyncio.to_thread(self._write_results, results)
+
+    def _write_results(self, results: List[CheckResult]) -> None:
+        """Upsert a batch of results; checks are best effort, so a failed batch is dropped"""
+        if not results:
+            return
+        db = self._session_factory()
+        try:
+            insert = UPSERT_INSERT[db.get_bind().dialect.name]
+            stmt = insert(LinkCheck)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[LinkCheck.short_url],
+                set_={column: stmt.excluded[column] for column in ("status_code", "error", "title", "checked_at")}
+            )
+            db.execute(stmt, [result._asdict() for result in results])
+            db.commit()
+            logger.debug(f"Stored {len(results)} link check results")
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Failed to store {len(results)} link check results: {str(e)}")
+        finally:
+            db.close()
+
+
+link_checker = LinkChecker(
+    queue_size=settings.LINK_CHECK_QUEUE_SIZE,
+    concurrency=settings.LINK_CHECK_CONCURRENCY,
+    per_host=settings.LINK_CHECK_PER_HOST,
+    timeout=settings.LINK_CHECK_TIMEOUT,
+    max_bytes=settings.LINK_CHECK_MAX_BYTES,
+    batch_size=settings.LINK_CHECK_BATCH_SIZE,
+    flush_interval=settings.LINK_CHECK_FLUSH_INTERVAL
+)
+checks_total = Counter("link_checks_total", "Completed target URL checks by result")
+checks_dropped = Counter("link_checks_dropped_total", "Checks skipped because the backlog was full")
+check_backlog = Gauge("link_check_backlog", "Target URL checks waiting for a slot", function=lambda: link_checker.backlog)
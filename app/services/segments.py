@@ -0,0 +1,330 @@
+# app/services/segments.py
+"""
+Immutable, sorted, compressed segment files holding cold short URLs.
+
+File layout (big-endian):
+    header  magic(4s) format_version(H) entry_count(I) block_count(I)
+            bloom_offset(Q) bloom_bits(I) bloom_hashes(B) index_offset(Q) index_length(I)
+    blocks  zlib("code\\0url\\0is_custom\\0created_at\\0..."), entries sorted by short code,
+            created_at as seconds since the epoch (UTC)
+    bloom   Bloom filter over every short code in the segment
+    index   per block: first_key_len(H) first_key offset(Q) length(I)
+
+Segments are memory-mapped. A lookup consults the Bloom filter, then the sparse
+index (one key per block) and decompresses a single block. Files are never
+modified after they are renamed into place; merging writes a new segment and
+then deletes the old ones.
+"""
+import bisect
+import hashlib
+import heapq
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from app.core.metrics import Gauge
+from ..core.config import get_settings
+from ..core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+SEGMENT_MAGIC = b"URLG"
+SEGMENT_FORMAT_VERSION = 1
+SEGMENT_SUFFIX = ".seg"
+HEADER = struct.Struct(">4sHIIQIBQI")
+INDEX_ENTRY = struct.Struct(">QI")
+KEY_LENGTH = struct.Struct(">H")
+# created_at is naive UTC; offsets from a naive epoch never go through local time
+EPOCH = datetime(1970, 1, 1)
+
+
+class SegmentEntry(NamedTuple):
+    short_url: str
+    original_url: str
+    is_custom: bool
+    created_at: datetime
+
+
+class BloomFilter:
+    """Bit array with k probes derived from one blake2b digest (double hashing)"""
+
+    def __init__(self, data, bits: int, hashes: int, offset: int = 0):
+        # `data` is a bytearray while building and the segment mmap when reading
+        self.data = data
+        self.bits = bits
+        self.hashes = hashes
+        self.offset = offset
+
+    @classmethod
+    def for_capacity(cls, capacity: int, fp_rate: float) -> "BloomFilter":
+        capacity = max(capacity, 1)
+        bits = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        bits = (bits + 7) // 8 * 8
+        hashes = max(1, round(bits / capacity * math.log(2)))
+        return cls(bytearray(bits // 8), bits, hashes)
+
+    def _positions(self, key: str) -> Iterator[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.data[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.data[self.offset + (position >> 3)] >> (position & 7) & 1
+            for position in self._positions(key)
+        )
+
+
+def _encode_block(entries: List[SegmentEntry]) -> bytes:
+    fields = []
+    for entry in entries:
+        fields.extend((
+            entry.short_url,
+            entry.original_url,
+            "1" if entry.is_custom else "0",
+            repr((entry.created_at - EPOCH).total_seconds()),
+        ))
+    return zlib.compress("\0".join(fields).encode(), 6)
+
+
+def _decode_fields(data: bytes) -> List[str]:
+    return zlib.decompress(data).decode().split("\0")
+
+
+def _entry_at(fields: List[str], i: int) -> SegmentEntry:
+    created_at = EPOCH + timedelta(seconds=float(fields[i + 3]))
+    return SegmentEntry(fields[i], fields[i + 1], fields[i + 2] == "1", created_at)
+
+
+def write_segment(
+    path: str,
+    entries: Iterable[SegmentEntry],
+    capacity: int,
+    block_size: Optional[int] = None,
+    fp_rate: Optional[float] = None
+) -> int:
+    """
+    Atomically write entries, which must be sorted by short code and unique, to
+    path. `capacity` (an upper bound on the entry count) sizes the Bloom filter.
+    Returns the number of entries written.
+    """
+    block_size = block_size or settings.SEGMENT_BLOCK_SIZE
+    bloom = BloomFilter.for_capacity(capacity, fp_rate or settings.SEGMENT_BLOOM_FP_RATE)
+    index: List[Tuple[str, int, int]] = []
+    count = 0
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(bytes(HEADER.size))
+        block: List[SegmentEntry] = []
+
+        def flush_block():
+            data = _encode_block(block)
+            index.append((block[0].short_url, f.tell(), len(data)))
+            f.write(data)
+            block.clear()
+
+        for entry in entries:
+            bloom.add(entry.short_url)
+            block.append(entry)
+            count += 1
+            if len(block) >= block_size:
+                flush_block()
+        if block:
+            flush_block()
+
+        bloom_offset = f.tell()
+        f.write(bloom.data)
+        index_offset = f.tell()
+        for first_key, offset, length in index:
+            key = first_key.encode()
+            f.write(KEY_LENGTH.pack(len(key)) + key + INDEX_ENTRY.pack(offset, length))
+        index_length = f.tell() - index_offset
+
+        f.seek(0)
+        f.write(HEADER.pack(
+            SEGMENT_MAGIC, SEGMENT_FORMAT_VERSION, count, len(index),
+            bloom_offset, bloom.bits, bloom.hashes, index_offset, index_length
+        ))
+        f.flush()
+        os.fsync(f.fileno())
+    # Readers only ever see complete segments
+    os.replace(tmp_path, path)
+    return count
+
+
+class Segment:
+    """A memory-mapped segment file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, version, self.entry_count, block_count, bloom_offset, bloom_bits,
+             bloom_hashes, index_offset, index_length) = HEADER.unpack_from(self._mmap)
+            if magic != SEGMENT_MAGIC or version != SEGMENT_FORMAT_VERSION:
+                raise ValueError(f"Unknown segment format: {path}")
+            self.bloom = BloomFilter(self._mmap, bloom_bits, bloom_hashes, offset=bloom_offset)
+
+            # The sparse index is small (one key per block) and kept in memory
+            self._first_keys: List[str] = []
+            self._blocks: List[Tuple[int, int]] = []
+            position = index_offset
+            for _ in range(block_count):
+                (key_length,) = KEY_LENGTH.unpack_from(self._mmap, position)
+                position += KEY_LENGTH.size
+                self._first_keys.append(self._mmap[position:position + key_length].decode())
+                position += key_length
+                self._blocks.append(INDEX_ENTRY.unpack_from(self._mmap, position))
+                position += INDEX_ENTRY.size
+            if position != index_offset + index_length:
+                raise ValueError(f"Corrupt segment index: {path}")
+        except (struct.error, UnicodeDecodeError, ValueError):
+            self._mmap.close()
+            raise
+
+    def _read_block(self, i: int) -> List[str]:
+        offset, length = self._blocks[i]
+        return _decode_fields(self._mmap[offset:offset + length])
+
+    def get(self, short_url: str) -> Optional[SegmentEntry]:
+        if short_url not in self.bloom:
+            return None
+        i = bisect.bisect_right(self._first_keys, short_url) - 1
+        if i < 0:
+            return None
+        fields = self._read_block(i)
+        # Keys are every fourth field; only the matching entry is built
+        keys = fields[0::4]
+        j = bisect.bisect_left(keys, short_url)
+        if j < len(keys) and keys[j] == short_url:
+            return _entry_at(fields, j * 4)
+        return None
+
+    def __iter__(self) -> Iterator[SegmentEntry]:
+        for i in range(len(self._blocks)):
+            fields = self._read_block(i)
+            for j in range(0, len(fields), 4):
+                yield _entry_at(fields, j)
+
+    def close(self) -> None:
+        self._mmap.close()
+
+
+class SegmentStore:
+    """
+    The segment files in a directory. Segments added or removed by other
+    processes are picked up on the next lookup, using the directory mtime.
+    """
+
+    def __init__(self, directory: Optional[str]):
+        self.directory = directory
+        self._segments: Dict[str, Segment] = {}
+        self._mtime_ns: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def configure(self, directory: Optional[str]) -> None:
+        """Point the store at another directory (None disables it)"""
+        self.close()
+        self.directory = directory
+
+    @property
+    def segments(self) -> List[Segment]:
+        self.refresh()
+        return list(self._segments.values())
+
+    def refresh(self, force: bool = False) -> None:
+        directory = self.directory
+        if not directory:
+            return
+        with self._lock:
+            # Retry if a segment disappears mid-scan (a concurrent merge)
+            for _ in range(3):
+                try:
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                except FileNotFoundError:
+                    return
+                if mtime_ns == self._mtime_ns and not force:
+                    return
+                if self._scan(directory):
+                    self._mtime_ns = mtime_ns
+                    return
+
+    def _scan(self, directory: str) -> bool:
+        names = {name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX)}
+        for name in list(self._segments):
+            if name not in names:
+                # Not closed here: a lookup on another thread may still be reading it.
+                # The mapping is released once the last reference goes away.
+                del self._segments[name]
+        complete = True
+        for name in sorted(names - self._segments.keys()):
+            try:
+                self._segments[name] = Segment(os.path.join(directory, name))
+            except FileNotFoundError:
+                complete = False
+            except (ValueError, struct.error, UnicodeDecodeError) as e:
+                logger.error(f"Skipping unreadable segment {name}: {str(e)}")
+        segment_files.set(len(self._segments))
+        return complete
+
+    def get(self, short_url: str) -> Optional[SegmentEntry]:
+        """Find a short code in any segment"""
+        for segment in self.segments:
+            entry = segment.get(short_url)
+            if entry is not None:
+                return entry
+        return None
+
+    def new_path(self) -> str:
+        if not self.directory:
+            raise RuntimeError("Segment store has no directory (SEGMENT_DIR is unset)")
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{time.time_ns():020d}-{os.getpid()}{SEGMENT_SUFFIX}")
+
+    def merge(self, segments: List[Segment]) -> Optional[str]:
+        """Merge segments into one new segment, then delete them"""
+        if len(segments) < 2:
+            return None
+        path = self.new_path()
+        merged = heapq.merge(*segments, key=lambda entry: entry.short_url)
+        count = write_segment(path, _unique(merged), capacity=sum(s.entry_count for s in segments))
+        # The merged segment is in place before its inputs disappear
+        for segment in segments:
+            os.unlink(segment.path)
+        self.refresh(force=True)
+        logger.info(f"Merged {len(segments)} segments into {os.path.basename(path)} ({count} entries)")
+        return path
+
+    def close(self) -> None:
+        with self._lock:
+            for segment in self._segments.values():
+                segment.close()
+            self._segments.clear()
+            self._mtime_ns = None
+        segment_files.set(0)
+
+
+def _unique(entries: Iterable[SegmentEntry]) -> Iterator[SegmentEntry]:
+    """Drop repeated short codes from a sorted stream (a row tiered twice after a crash)"""
+    previous = None
+    for entry in entries:
+        if entry.short_url != previous:
+            yield entry
+            previous = entry.short_url
+
+
+segment_files = Gauge("url_segment_files", "Cold-tier segment files open in this process")
+segment_store = SegmentStore(settings.SEGMENT_DIR)
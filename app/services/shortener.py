@@ -1,16 +1,47 @@
 # app/services/shortener.py
 import hashlib
 import re
+from typing import Callable, List, NamedTuple, Optional, Set, Tuple
 from fastapi import HTTPException
+from sqlalchemy import bindparam, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.db.models import URL
+from app.core.circuit_breaker import CircuitOpenError
+from app.db.base import db_breaker
+from app.db.models import URL, IdempotencyKey
 from app.schemas.url import URLBase
+from .cache import url_cache
+from .code_index import code_index
+from .idempotency import find_idempotent_create
+from .compact import compact_fields, expand_url
+from .link_checker import link_checker
+from .segments import segment_store
 from ..core.config import get_settings
 from ..core.logging import get_logger
+from ..core.profiling import phase
 
 settings = get_settings()
 logger = get_logger(__name__)
 
+# Built once so every lookup reuses the same compiled statement from the engine's
+# compiled cache. Selecting only the target columns skips ORM hydration and the
+# identity map entirely.
+LOOKUP_ORIGINAL_URL = select(
+    URL.original_url, URL.domain_id, URL.compressed_path, URL.dictionary_id
+).where(URL.short_url == bindparam("short_url"))
+
+CUSTOM_URL_PATTERN = re.compile(r'^[a-zA-Z0-9][a-zA-Z0-9-]*[a-zA-Z0-9]$')
+RESERVED_WORDS = frozenset({'admin', 'api', 'login', 'signup', 'dashboard'})
+# Numbered variants tried per code when suggesting alternatives
+SUGGESTION_ATTEMPTS = 20
+
+
+class CustomURLAvailability(NamedTuple):
+    custom_url: str
+    available: bool
+    reason: Optional[str]
+    suggestions: List[str]
+
 
 def create_short_url(url: str) -> str:
     """Create a short URL using first N characters of MD5 hash"""
@@ -23,8 +54,7 @@ def validate_custom_url(custom_url: str) -> bool:
     if not custom_url:
         return True
     
-    pattern = r'^[a-zA-Z0-9][a-zA-Z0-9-]*[a-zA-Z0-9]$'
-    if not re.match(pattern, custom_url):
+    if not CUSTOM_URL_PATTERN.match(custom_url):
         logger.warning(f"Invalid custom URL format: {custom_url}")
         return False
     
@@ -33,26 +63,96 @@ def validate_custom_url(custom_url: str) -> bool:
         return False
     
     # Check for reserved words
-    reserved_words = {'admin', 'api', 'login', 'signup', 'dashboard'}
-    if custom_url.lower() in reserved_words:
+    if custom_url.lower() in RESERVED_WORDS:
         logger.warning(f"Attempted to use reserved word as custom URL: {custom_url}")
         return False
     
     return True
 
+def service_unavailable(retry_after: int) -> HTTPException:
+    """503 telling clients when the database is expected to be usable again"""
+    return HTTPException(
+        status_code=503,
+        detail="Service temporarily unavailable",
+        headers={"Retry-After": str(retry_after)}
+    )
+
 def create_url_record(db: Session, url_data: URLBase) -> URL:
-    """Create a new URL record"""
+    """Create a new URL record, failing fast with 503 while the database circuit is open"""
+    try:
+        with db_breaker.call():
+            return _create_url_record(db, url_data)
+    except CircuitOpenError as e:
+        logger.warning(f"Rejected create while database circuit is open: {url_data.target_url}")
+        raise service_unavailable(e.retry_after)
+    except db_breaker.failure_exceptions as e:
+        db.rollback()
+        logger.error(f"Database unavailable while creating URL record: {str(e)}")
+        raise service_unavailable(db_breaker.retry_after())
+
+def create_url_record_once(db: Session, url_data: URLBase, key: str, fingerprint: str) -> Tuple[URL, bool]:
+    """
+    Create a URL record for a request carrying an Idempotency-Key, returning
+    (record, replayed). A key already committed by any worker replays its URL.
+    """
+    try:
+        with db_breaker.call():
+            return _create_url_record_once(db, url_data, key, fingerprint)
+    except CircuitOpenError as e:
+        logger.warning(f"Rejected create while database circuit is open: {url_data.target_url}")
+        raise service_unavailable(e.retry_after)
+    except db_breaker.failure_exceptions as e:
+        db.rollback()
+        logger.error(f"Database unavailable while creating URL record: {str(e)}")
+        raise service_unavailable(db_breaker.retry_after())
+
+def _create_url_record_once(db: Session, url_data: URLBase, key: str, fingerprint: str) -> Tuple[URL, bool]:
+    with phase("db_query"):
+        record = find_idempotent_create(db, key, fingerprint)
+    if record is not None:
+        logger.info(f"Replaying create for Idempotency-Key {key}: {record.short_url}")
+        return record, True
+    try:
+        return _create_url_record(db, url_data, (key, fingerprint)), False
+    except (HTTPException, IntegrityError) as e:
+        # A request with the same key on another worker may have committed first,
+        # taking the custom code (400) or the key itself (IntegrityError)
+        if isinstance(e, IntegrityError):
+            db.rollback()
+        with phase("db_query"):
+            record = find_idempotent_create(db, key, fingerprint)
+        if record is None:
+            raise
+        logger.info(f"Replaying concurrent create for Idempotency-Key {key}: {record.short_url}")
+        return record, True
+
+def _save_idempotency_key(db: Session, idempotency_key: Optional[Tuple[str, str]], short_url: str) -> None:
+    """Stage the (key, fingerprint) row so it commits together with the create"""
+    if idempotency_key is not None:
+        key, fingerprint = idempotency_key
+        db.add(IdempotencyKey(key=key, fingerprint=fingerprint, short_url=short_url))
+
+def _create_url_record(db: Session, url_data: URLBase, idempotency_key: Optional[Tuple[str, str]] = None) -> URL:
     try:
         # Handle custom URL if provided
         if url_data.custom_url:
-            if not validate_custom_url(url_data.custom_url):
+            with phase("validation"):
+                is_valid = validate_custom_url(url_data.custom_url)
+            if not is_valid:
                 raise HTTPException(
                     status_code=400, 
                     detail="Invalid custom URL. Use 4-30 alphanumeric characters and hyphens. Cannot start or end with hyphen."
                 )
             
-            # Check if custom URL is already taken
-            existing_url = db.query(URL).filter(URL.short_url == url_data.custom_url).first()
+            # Check if custom URL is already taken, in the index, the table or the cold tier.
+            # Codes are never removed, so an indexed code is taken for certain.
+            existing_url = url_data.custom_url in code_index
+            if not existing_url:
+                with phase("db_query"):
+                    existing_url = db.query(URL).filter(URL.short_url == url_data.custom_url).first()
+            if existing_url is None:
+                with phase("segment_lookup"):
+                    existing_url = segment_store.get(url_data.custom_url)
             if existing_url:
                 logger.warning(f"Custom URL already taken: {url_data.custom_url}")
                 raise HTTPException(
@@ -68,21 +168,56 @@ def create_url_record(db: Session, url_data: URLBase) -> URL:
             short_url = create_short_url(str(url_data.target_url))
             is_custom = False
             
-            # Check if URL already exists
-            existing_url = db.query(URL).filter(URL.original_url == str(url_data.target_url)).first()
-            if existing_url and not existing_url.is_custom:
+            # Check if URL already exists. Auto codes are derived from the URL, so
+            # the primary key finds it whether or not the row is stored compactly.
+            with phase("db_query"):
+                existing_url = db.query(URL).filter(URL.short_url == short_url).first()
+            if existing_url and not existing_url.is_custom and existing_url.target_url == str(url_data.target_url):
                 logger.info(f"Returning existing URL for: {url_data.target_url}")
+                if idempotency_key is not None:
+                    _save_idempotency_key(db, idempotency_key, short_url)
+                    db.commit()
                 return existing_url
+            if existing_url is None:
+                with phase("segment_lookup"):
+                    cold_url = segment_store.get(short_url)
+                if cold_url and not cold_url.is_custom and cold_url.original_url == str(url_data.target_url):
+                    logger.info(f"Returning existing cold URL for: {url_data.target_url}")
+                    # Not recorded under the key: a retry finds the same cold URL again.
+                    # Not added to the session: the row stays in its segment
+                    return URL(
+                        short_url=cold_url.short_url,
+                        original_url=cold_url.original_url,
+                        is_custom=False,
+                        created_at=cold_url.created_at
+                    )
+                if cold_url:
+                    # Inserting would shadow the tiered mapping
+                    logger.error(f"Short URL {short_url} for {url_data.target_url} collides with a cold URL")
+                    raise HTTPException(
+                        status_code=409,
+                        detail="Generated short URL is already in use"
+                    )
         
         # Create new URL entry
+        if settings.URL_COMPACT_STORAGE:
+            columns = compact_fields(db, str(url_data.target_url))
+        else:
+            columns = {"original_url": str(url_data.target_url)}
         db_url = URL(
-            original_url=str(url_data.target_url),
             short_url=short_url,
-            is_custom=is_custom
+            is_custom=is_custom,
+            **columns
         )
         db.add(db_url)
-        db.commit()
-        db.refresh(db_url)
+        _save_idempotency_key(db, idempotency_key, short_url)
+        with phase("commit"):
+            db.commit()
+            db.refresh(db_url)
+        url_cache.put(short_url, str(url_data.target_url))
+        code_index.add(short_url)
+        # Checked in the background; a full backlog just skips the check
+        link_checker.submit(short_url, str(url_data.target_url))
         logger.info(f"Created new URL record: {short_url} -> {url_data.target_url}")
         return db_url
         
@@ -90,11 +225,99 @@ def create_url_record(db: Session, url_data: URLBase) -> URL:
         logger.error(f"Error creating URL record: {str(e)}")
         raise
 
-def get_url_by_shortcode(db: Session, short_url: str) -> URL:
-    """Retrieve URL record by short code"""
-    url = db.query(URL).filter(URL.short_url == short_url).first()
-    if url:
+def suggestion_candidates(custom_url: str) -> List[str]:
+    """Valid numbered variants of a code, closest first (code1, code-1, code2, ...)"""
+    base = re.sub(r'[^a-zA-Z0-9-]', '', custom_url).strip('-')
+    candidates = []
+    for n in range(1, SUGGESTION_ATTEMPTS + 1):
+        for suffix in (str(n), f"-{n}"):
+            # Trim the base, not the suffix, so long codes still get variants
+            prefix = base[:settings.MAX_CUSTOM_URL_LENGTH - len(suffix)].rstrip('-')
+            candidate = prefix + suffix
+            if (
+                prefix and len(candidate) >= settings.MIN_CUSTOM_URL_LENGTH
+                and candidate.lower() not in RESERVED_WORDS and candidate not in candidates
+            ):
+                candidates.append(candidate)
+    return candidates
+
+def taken_custom_urls(db: Session, candidates: Set[str]) -> Callable[[str], bool]:
+    """
+    A membership test for codes in use. Answered from the code index once it is
+    loaded; until then, one query covers every candidate.
+    """
+    if code_index.ready:
+        return code_index.__contains__
+    try:
+        with db_breaker.call(), phase("db_query"):
+            taken = set(db.execute(select(URL.short_url).where(URL.short_url.in_(candidates))).scalars())
+    except CircuitOpenError as e:
+        raise service_unavailable(e.retry_after)
+    except db_breaker.failure_exceptions as e:
+        logger.error(f"Database unavailable while checking custom URLs: {str(e)}")
+        raise service_unavailable(db_breaker.retry_after())
+    with phase("segment_lookup"):
+        taken.update(code for code in candidates - taken if segment_store.get(code))
+    return taken.__contains__
+
+def check_custom_urls(db: Session, custom_urls: List[str], suggestions: int) -> List[CustomURLAvailability]:
+    """Availability of each custom code, with up to `suggestions` free alternatives for unavailable ones"""
+    # An empty code means "no custom code" to validate_custom_url, but is never available
+    valid = {custom_url: bool(custom_url) and validate_custom_url(custom_url) for custom_url in custom_urls}
+    variants = {custom_url: suggestion_candidates(custom_url) if suggestions else [] for custom_url in custom_urls}
+    candidates = {custom_url for custom_url, is_valid in valid.items() if is_valid}
+    is_taken = taken_custom_urls(db, candidates.union(*variants.values()))
+
+    results = []
+    for custom_url in custom_urls:
+        if valid[custom_url] and not is_taken(custom_url):
+            results.append(CustomURLAvailability(custom_url, True, None, []))
+            continue
+        free = [variant for variant in variants[custom_url] if not is_taken(variant)]
+        results.append(CustomURLAvailability(
+            custom_url, False, "taken" if valid[custom_url] else "invalid", free[:suggestions]
+        ))
+    return results
+
+def get_url_by_shortcode(db: Session, short_url: str) -> Optional[str]:
+    """
+    Retrieve the original URL for a short code.
+
+    Cached (or snapshot-loaded) entries are served without touching the
+    database, which keeps hot redirects working while the database circuit is
+    open. Uncached codes get a 503 with Retry-After in that case. Codes missing
+    from the table are looked up in the cold-tier segment files.
+    """
+    # Mappings never change once created, so cached entries are always valid
+    original_url = url_cache.get(short_url)
+    if original_url is not None:
+        return original_url
+
+    try:
+        with db_breaker.call(), phase("db_query"):
+            original_url = fetch_original_url(db, short_url)
+    except CircuitOpenError as e:
+        logger.warning(f"Database circuit open, cannot resolve uncached short code: {short_url}")
+        raise service_unavailable(e.retry_after)
+    except db_breaker.failure_exceptions as e:
+        logger.error(f"Database unavailable while resolving {short_url}: {str(e)}")
+        raise service_unavailable(db_breaker.retry_after())
+    if original_url is None:
+        with phase("segment_lookup"):
+            cold_url = segment_store.get(short_url)
+        original_url = cold_url.original_url if cold_url else None
+    if original_url:
+        url_cache.put(short_url, original_url)
         logger.debug(f"Retrieved URL for short code: {short_url}")
     else:
         logger.warning(f"No URL found for short code: {short_url}")
-    return url
+    return original_url
+
+def fetch_original_url(db: Session, short_url: str) -> Optional[str]:
+    """Read the original URL for a short code from the database, decoding compact rows"""
+    row = db.connection().execute(LOOKUP_ORIGINAL_URL, {"short_url": short_url}).first()
+    if row is None:
+        return None
+    if row.original_url is not None:
+        return row.original_url
+    return expand_url(db, row.domain_id, row.compressed_path, row.dictionary_id)
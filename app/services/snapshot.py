@@ -0,0 +1,101 @@
+# app/services/snapshot.py
+"""
+Warm-start snapshots of the hottest cached short code -> URL mappings.
+
+File layout (big-endian):
+    header  magic(4s) format_version(H) created_at(d) count(I) app_version_len(H)
+    app_version (utf-8)
+    payload zlib("code\\0url\\0hits\\0..."), entries sorted by short code
+"""
+import asyncio
+import os
+import struct
+import time
+import zlib
+from typing import Optional
+from .cache import URLCache
+from ..core.config import get_settings
+from ..core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+SNAPSHOT_MAGIC = b"URLS"
+SNAPSHOT_FORMAT_VERSION = 1
+HEADER = struct.Struct(">4sHdIH")
+
+
+def write_snapshot(cache: URLCache, path: str, top_n: int) -> int:
+    """Atomically write the top_n hottest cache entries to path, returning the entry count"""
+    entries = sorted(cache.hottest(top_n))
+    fields = []
+    for short_url, original_url, hits in entries:
+        fields.extend((short_url, original_url, str(hits)))
+    payload = zlib.compress("\0".join(fields).encode(), 6)
+    app_version = settings.APP_VERSION.encode()
+
+    # Per-process temp file: pre-forked workers may write snapshots concurrently
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, time.time(), len(entries), len(app_version)))
+        f.write(app_version)
+        f.write(payload)
+    # Readers only ever see a complete file
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote cache snapshot with {len(entries)} entries to {path}")
+    return len(entries)
+
+
+def load_snapshot(cache: URLCache, path: str, max_age: Optional[int] = None) -> int:
+    """Load a snapshot into the cache, returning the number of entries added (0 if rejected)"""
+    max_age = settings.SNAPSHOT_MAX_AGE if max_age is None else max_age
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        logger.info(f"No cache snapshot at {path}, starting cold")
+        return 0
+
+    try:
+        magic, version, created_at, count, app_version_len = HEADER.unpack_from(data)
+    except struct.error:
+        logger.warning(f"Rejected truncated cache snapshot: {path}")
+        return 0
+    offset = HEADER.size + app_version_len
+    app_version = data[HEADER.size:offset].decode(errors="replace")
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_FORMAT_VERSION:
+        logger.warning(f"Rejected cache snapshot with unknown format: {path}")
+        return 0
+    if app_version != settings.APP_VERSION:
+        logger.warning(f"Rejected cache snapshot from app version {app_version}: {path}")
+        return 0
+    age = time.time() - created_at
+    if age > max_age:
+        logger.warning(f"Rejected stale cache snapshot ({age:.0f}s old): {path}")
+        return 0
+
+    try:
+        fields = zlib.decompress(data[offset:]).decode().split("\0") if count else []
+    except (zlib.error, UnicodeDecodeError):
+        logger.warning(f"Rejected corrupt cache snapshot: {path}")
+        return 0
+    if len(fields) != count * 3:
+        logger.warning(f"Rejected corrupt cache snapshot: {path}")
+        return 0
+
+    loaded = 0
+    for i in range(0, len(fields), 3):
+        if cache.put_if_absent(fields[i], fields[i + 1], int(fields[i + 2])):
+            loaded += 1
+    logger.info(f"Loaded {loaded} cache entries from snapshot {path}")
+    return loaded
+
+
+async def run_snapshot_writer(cache: URLCache, path: str, interval: float, top_n: int) -> None:
+    """Periodically write snapshots until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(write_snapshot, cache, path, top_n)
+        except OSError as e:
+            logger.error(f"Failed to write cache snapshot: {str(e)}")
@@ -0,0 +1,144 @@
+# app/services/tiering.py
+"""
+Moves cold short URLs out of the urls table into segment files.
+
+A URL is cold once it is older than TIERING_COLD_AFTER_DAYS and the click
+rollups show no click in that window. Each batch is written to a new segment
+before its rows are deleted, so every URL is always readable from one tier or
+the other. Only one process tiers or merges at a time (an flock on the segment
+directory), which matters when pre-forked workers all run the background job.
+"""
+import asyncio
+import fcntl
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+from sqlalchemy import delete, exists, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.db.models import URL, HourlyClicks, DailyClicks
+from .analytics import day_bucket
+from .compact import expand_url
+from .segments import SegmentEntry, SegmentStore, segment_store, write_segment
+from ..core.config import get_settings
+from ..core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+DELETE_CHUNK = 500
+
+
+@contextmanager
+def tiering_lock(directory: str) -> Iterator[bool]:
+    """Yield True if this process holds the directory's tiering lock"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def select_cold_urls(cutoff: datetime, limit: int):
+    """Rows created before cutoff with no click since, in short code order"""
+    recent_hour = exists().where(HourlyClicks.short_url == URL.short_url, HourlyClicks.bucket >= cutoff)
+    recent_day = exists().where(DailyClicks.short_url == URL.short_url, DailyClicks.bucket >= day_bucket(cutoff))
+    return (
+        select(
+            URL.short_url, URL.original_url, URL.domain_id, URL.compressed_path,
+            URL.dictionary_id, URL.is_custom, URL.created_at
+        )
+        .where(URL.created_at < cutoff, ~recent_hour, ~recent_day)
+        .order_by(URL.short_url)
+        .limit(limit)
+    )
+
+
+def tier_batch(db: Session, store: SegmentStore, cutoff: datetime, batch_size: int) -> int:
+    """Move one batch of cold rows into a new segment, returning the number moved"""
+    rows = db.execute(select_cold_urls(cutoff, batch_size)).all()
+    if not rows:
+        return 0
+    entries = [
+        SegmentEntry(
+            row.short_url,
+            row.original_url if row.original_url is not None
+            else expand_url(db, row.domain_id, row.compressed_path, row.dictionary_id),
+            bool(row.is_custom),
+            row.created_at,
+        )
+        for row in rows
+    ]
+    path = store.new_path()
+    write_segment(path, entries, capacity=len(entries))
+    # Readers must see the segment before the rows disappear from the table
+    store.refresh(force=True)
+
+    codes = [entry.short_url for entry in entries]
+    for i in range(0, len(codes), DELETE_CHUNK):
+        db.execute(delete(URL).where(URL.short_url.in_(codes[i:i + DELETE_CHUNK])))
+    db.commit()
+    logger.info(f"Moved {len(entries)} cold URLs to segment {os.path.basename(path)}")
+    return len(entries)
+
+
+def merge_segments(store: SegmentStore, max_count: int) -> Optional[str]:
+    """Merge the smallest segments so at most max_count remain"""
+    segments = store.segments
+    if len(segments) <= max_count:
+        return None
+    smallest = sorted(segments, key=lambda segment: segment.entry_count)
+    return store.merge(smallest[:len(segments) - max_count + 1])
+
+
+def run_tiering(
+    db: Session,
+    store: SegmentStore = segment_store,
+    cold_after_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    max_segments: Optional[int] = None
+) -> int:
+    """Move every cold URL to segments and merge small segments, returning the number moved"""
+    if not store.directory:
+        return 0
+    cold_after_days = settings.TIERING_COLD_AFTER_DAYS if cold_after_days is None else cold_after_days
+    batch_size = batch_size or settings.TIERING_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(days=cold_after_days)
+
+    with tiering_lock(store.directory) as acquired:
+        if not acquired:
+            logger.debug("Tiering already running in another process")
+            return 0
+        moved = 0
+        while True:
+            count = tier_batch(db, store, cutoff, batch_size)
+            moved += count
+            if count < batch_size:
+                break
+        merge_segments(store, max_segments or settings.SEGMENT_MAX_COUNT)
+    return moved
+
+
+def _run_tiering_job(session_factory) -> None:
+    db = session_factory()
+    try:
+        run_tiering(db)
+    finally:
+        db.close()
+
+
+async def run_tiering_worker(session_factory, interval: float) -> None:
+    """Periodically tier cold URLs and merge segments until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(_run_tiering_job, session_factory)
+        except (SQLAlchemyError, OSError) as e:
+            logger.error(f"Tiering failed: {str(e)}")
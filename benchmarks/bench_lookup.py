@@ -0,0 +1,84 @@
+# benchmarks/bench_lookup.py
+"""
+Compare the ORM lookup path against the compiled Core lookup used by
+get_url_by_shortcode, at several table sizes. fetch_original_url is timed
+directly: through get_url_by_shortcode every repeated code would be a
+url_cache hit rather than a query.
+
+Usage:
+    python -m benchmarks.bench_lookup [--sizes 1000 10000 100000] [--lookups 20000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from app.db.base import Base
+from app.db.models import URL
+from app.services.shortener import create_short_url, fetch_original_url
+
+SEED = 1234
+
+
+def orm_lookup(db, short_url):
+    """The previous lookup path: hydrate a full URL object"""
+    url = db.query(URL).filter(URL.short_url == short_url).first()
+    return url.original_url if url else None
+
+
+def build_database(path, size):
+    """Create a SQLite database holding `size` URL rows"""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    rows = []
+    for i in range(size):
+        original_url = f"https://example.com/articles/{i}?utm_source=bench&ref={i % 97}"
+        rows.append({"short_url": create_short_url(original_url), "original_url": original_url, "is_custom": False})
+    with engine.begin() as conn:
+        conn.execute(insert(URL), rows)
+    return engine, [row["short_url"] for row in rows]
+
+
+def time_lookups(session_factory, lookup, codes):
+    """Return lookups per second for the given lookup function"""
+    db = session_factory()
+    try:
+        start = time.perf_counter()
+        for code in codes:
+            lookup(db, code)
+            # Each request gets a fresh session in the app, so do not let the
+            # identity map turn repeated ORM lookups into cache hits
+            db.expunge_all()
+        return len(codes) / (time.perf_counter() - start)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--lookups", type=int, default=20_000)
+    args = parser.parse_args()
+
+    rng = random.Random(SEED)
+    print(f"{'rows':>10} {'orm ops/s':>12} {'core ops/s':>12} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            engine, codes = build_database(os.path.join(tmp, f"bench_{size}.db"), size)
+            session_factory = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+            sample = [rng.choice(codes) for _ in range(args.lookups)]
+
+            # Warm up both paths so statement compilation is not measured
+            time_lookups(session_factory, orm_lookup, sample[:100])
+            time_lookups(session_factory, fetch_original_url, sample[:100])
+
+            orm = time_lookups(session_factory, orm_lookup, sample)
+            core = time_lookups(session_factory, fetch_original_url, sample)
+            print(f"{size:>10} {orm:>12,.0f} {core:>12,.0f} {core / orm:>7.2f}x")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/bench_server_scaling.py
+"""
+Measure how redirect throughput scales with the number of pre-forked workers.
+
+For each worker count the launcher (app.server) is started against a fresh
+SQLite database, seeded with short URLs, and loaded by keep-alive clients
+running in separate processes so the load generator is not the bottleneck.
+
+Usage:
+    python -m benchmarks.bench_server_scaling [--workers 1 2 4] [--clients 16] [--duration 5]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+SEED = 4321
+HOST = "127.0.0.1"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(HOST, port, timeout=1)
+            conn.request("GET", "/api/openapi.json")
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start within {timeout}s")
+
+
+def seed_urls(port: int, count: int) -> List[str]:
+    """Create `count` custom short URLs and return their codes"""
+    conn = http.client.HTTPConnection(HOST, port)
+    codes = []
+    for i in range(count):
+        code = f"bench-{i}"
+        body = json.dumps({"target_url": f"https://example.com/articles/{i}?ref=bench", "custom_url": code})
+        conn.request("POST", "/url", body=body, headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        response.read()
+        if response.status != 201:
+            raise RuntimeError(f"Seeding failed with HTTP {response.status}")
+        codes.append(code)
+    conn.close()
+    return codes
+
+
+def client(port: int, codes: List[str], duration: float, seed: int, results) -> None:
+    """One keep-alive client issuing redirects until the deadline"""
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(HOST, port)
+    done = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        conn.request("GET", f"/{rng.choice(codes)}")
+        conn.getresponse().read()
+        done += 1
+    conn.close()
+    results.put(done)
+
+
+def measure(workers: int, clients: int, duration: float, urls: int) -> float:
+    """Start the launcher with `workers` workers and return redirects per second"""
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            LOG_LEVEL="WARNING",
+            LOG_FILE="",
+            SNAPSHOT_PATH="",
+        )
+        server = subprocess.Popen(
+            [sys.executable, "-m", "app.server", "--workers", str(workers), "--port", str(port)],
+            env=env
+        )
+        try:
+            wait_until_ready(port)
+            codes = seed_urls(port, urls)
+            results = multiprocessing.Queue()
+            procs = [
+                multiprocessing.Process(target=client, args=(port, codes, duration, SEED + i, results))
+                for i in range(clients)
+            ]
+            for proc in procs:
+                proc.start()
+            total = sum(results.get() for _ in procs)
+            for proc in procs:
+                proc.join()
+            return total / duration
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+
+
+def main():
+    cores = os.cpu_count() or 1
+    default_counts = sorted({1, *(n for n in (2, 4, 8, 16, 32) if n < cores), cores})
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=default_counts)
+    parser.add_argument("--clients", type=int, default=max(4, cores * 2))
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--urls", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{cores} cores, {args.clients} clients, {args.duration:.0f}s per run")
+    print(f"{'workers':>8} {'req/s':>10} {'scaling':>8}")
+    base = None
+    for workers in args.workers:
+        rate = measure(workers, args.clients, args.duration, args.urls)
+        base = base or rate
+        print(f"{workers:>8} {rate:>10,.0f} {rate / base:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# benchmarks/cases.py
+"""Microbenchmarks for the shortener hot functions, on fixed seeded datasets"""
+import itertools
+import random
+from typing import List
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.db.models import URL
+from app.db.schema import upgrade_schema
+from app.schemas.url import URLBase, URLInfo
+from app.services.cache import url_cache
+from app.services.shortener import (
+    create_short_url, validate_custom_url, create_url_record, get_url_by_shortcode
+)
+from benchmarks.harness import Case
+
+SEED = 20240107
+TABLE_SIZE = 10_000
+
+HOSTS = ["https://example.com", "https://shop.example.org", "https://news.example.net", "https://docs.example.io"]
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet"]
+
+
+def make_urls(count: int, seed: int = SEED) -> List[str]:
+    """Deterministic, realistic-looking target URLs with distinct auto codes"""
+    rng = random.Random(seed)
+    urls = {}
+    while len(urls) < count:
+        url = (
+            f"{rng.choice(HOSTS)}/{rng.choice(WORDS)}/{rng.randint(1, 10 ** 9)}"
+            f"?utm_source={rng.choice(WORDS)}&utm_medium=email&ref={rng.randint(1, 999)}"
+        )
+        urls.setdefault(create_short_url(url), url)
+    return list(urls.values())
+
+
+def make_custom_codes(count: int, seed: int = SEED) -> List[str]:
+    """Mix of valid, malformed, out-of-range and reserved custom codes"""
+    rng = random.Random(seed)
+    codes = []
+    for _ in range(count):
+        kind = rng.random()
+        word = rng.choice(WORDS)
+        if kind < 0.7:
+            codes.append(f"{word}-{rng.randint(1, 10 ** 6)}")
+        elif kind < 0.8:
+            codes.append(f"-{word}")
+        elif kind < 0.9:
+            codes.append(word * 8)
+        else:
+            codes.append(rng.choice(["admin", "api", "login", "signup", "dashboard"]))
+    return codes
+
+
+def make_session_factory(rows: List[str]):
+    """In-memory database holding the given URLs under their auto codes"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    upgrade_schema(engine)
+    if rows:
+        with engine.begin() as conn:
+            conn.execute(insert(URL), [
+                {"short_url": create_short_url(url), "original_url": url, "is_custom": False} for url in rows
+            ])
+    return sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+
+def bench_create_short_url():
+    urls = itertools.cycle(make_urls(1_000))
+    return lambda: create_short_url(next(urls))
+
+
+def bench_validate_custom_url():
+    codes = itertools.cycle(make_custom_codes(1_000))
+    return lambda: validate_custom_url(next(codes))
+
+
+def bench_create_url_record():
+    url_cache.clear()
+    session_factory = make_session_factory([])
+    payloads = iter([URLBase(target_url=url) for url in make_urls(5_000, seed=SEED + 1)])
+
+    def op():
+        # One session per call, as in a request
+        db = session_factory()
+        try:
+            create_url_record(db, next(payloads))
+        finally:
+            db.close()
+    return op
+
+
+def bench_create_url_record_custom():
+    url_cache.clear()
+    session_factory = make_session_factory([])
+    rng = random.Random(SEED + 2)
+    payloads = iter([
+        URLBase(target_url=url, custom_url=f"{rng.choice(WORDS)}-{i}")
+        for i, url in enumerate(make_urls(5_000, seed=SEED + 2))
+    ])
+
+    def op():
+        db = session_factory()
+        try:
+            create_url_record(db, next(payloads))
+        finally:
+            db.close()
+    return op
+
+
+def _lookup_fixture():
+    urls = make_urls(TABLE_SIZE, seed=SEED + 3)
+    session_factory = make_session_factory(urls)
+    rng = random.Random(SEED + 3)
+    codes = itertools.cycle([create_short_url(rng.choice(urls)) for _ in range(1_000)])
+    return session_factory, codes
+
+
+def bench_get_url_by_shortcode_uncached():
+    session_factory, codes = _lookup_fixture()
+
+    def op():
+        url_cache.clear()
+        db = session_factory()
+        try:
+            get_url_by_shortcode(db, next(codes))
+        finally:
+            db.close()
+    return op
+
+
+def bench_get_url_by_shortcode_cached():
+    session_factory, codes = _lookup_fixture()
+    url_cache.clear()
+    db = session_factory()
+    return lambda: get_url_by_shortcode(db, next(codes))
+
+
+def bench_parse_url_base():
+    rng = random.Random(SEED + 4)
+    payloads = itertools.cycle([
+        {"target_url": url, "custom_url": f"{rng.choice(WORDS)}-{i}" if i % 2 else None}
+        for i, url in enumerate(make_urls(1_000, seed=SEED + 4))
+    ])
+    return lambda: URLBase.model_validate(next(payloads))
+
+
+def bench_parse_url_info():
+    payloads = itertools.cycle([
+        {
+            "target_url": url,
+            "short_url": create_short_url(url),
+            "created_at": "2024-01-07T12:00:00",
+            "is_custom": False,
+        }
+        for url in make_urls(1_000, seed=SEED + 5)
+    ])
+    return lambda: URLInfo.model_validate(next(payloads))
+
+
+CASES = [
+    Case("create_short_url", bench_create_short_url, number=20_000),
+    Case("validate_custom_url", bench_validate_custom_url, number=20_000),
+    Case("create_url_record", bench_create_url_record, number=1_000),
+    Case("create_url_record_custom", bench_create_url_record_custom, number=1_000),
+    Case("get_url_by_shortcode_uncached", bench_get_url_by_shortcode_uncached, number=2_000),
+    Case("get_url_by_shortcode_cached", bench_get_url_by_shortcode_cached, number=20_000),
+    Case("parse_url_base", bench_parse_url_base, number=20_000),
+    Case("parse_url_info", bench_parse_url_info, number=20_000),
+]
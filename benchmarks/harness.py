@@ -0,0 +1,117 @@
+# benchmarks/harness.py
+import gc
+import hashlib
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Dict, Tuple
+
+# Shorter rounds are dominated by scheduler and frequency-scaling noise
+MIN_ROUND_SECONDS = 0.2
+
+
+@dataclass
+class Case:
+    """
+    A microbenchmark. `setup` builds fresh state and returns a zero-argument
+    callable performing exactly one operation; it is called before every
+    timing round so rounds do not see each other's side effects.
+    """
+    name: str
+    setup: Callable[[], Callable[[], object]]
+    number: int = 1000
+
+
+def _calibration_setup() -> Callable[[], object]:
+    """Fixed pure-Python work (hashing, formatting, sorting) that no code change affects"""
+    words = [f"word-{i}" for i in range(50)]
+
+    def op():
+        digest = hashlib.sha256(",".join(words).encode()).hexdigest()
+        return sorted(f"{word}:{digest[:8]}" for word in words)
+    return op
+
+
+# Timed next to every round; cases are compared by their speed relative to it,
+# so a machine that is slower for a while (frequency scaling, noisy neighbours)
+# slows both sides of the ratio
+CALIBRATION = Case("calibration", _calibration_setup, number=1000)
+
+
+def _time_batch(case: Case) -> float:
+    """Seconds taken by `case.number` operations on fresh state"""
+    op = case.setup()
+    op()  # warm up caches and statement compilation
+    start = time.perf_counter()
+    for _ in range(case.number):
+        op()
+    return time.perf_counter() - start
+
+
+def _time_round(case: Case, min_time: float) -> float:
+    """Operations per second over batches timed for at least `min_time` seconds"""
+    batches, elapsed = 0, 0.0
+    gc.collect()
+    gc.disable()
+    try:
+        while elapsed < min_time or not batches:
+            elapsed += _time_batch(case)
+            batches += 1
+    finally:
+        gc.enable()
+    return batches * case.number / elapsed
+
+
+def time_case(case: Case, rounds: int, min_time: float = MIN_ROUND_SECONDS) -> Tuple[float, float]:
+    """
+    Median operations per second over `rounds` rounds, after one discarded
+    round, and the median ratio of that rate to the calibration rate timed
+    right after each round. Each round repeats batches of `case.number`
+    operations until it has been timed for at least `min_time` seconds.
+    """
+    rates, ratios = [], []
+    for round_number in range(rounds + 1):
+        rate = _time_round(case, min_time)
+        calibration = _time_round(CALIBRATION, min_time)
+        if round_number:
+            rates.append(rate)
+            ratios.append(rate / calibration)
+    return statistics.median(rates), statistics.median(ratios)
+
+
+def trace_case(case: Case, calls: int = 200) -> Dict[str, float]:
+    """
+    Allocation profile per call, measured with tracemalloc in a separate pass
+    (tracing slows execution too much to share a pass with timing).
+
+    - peak_bytes: mean of the peak traced memory above the starting point during one call
+    - retained_bytes: memory still allocated after the calls, per call
+    """
+    op = case.setup()
+    op()
+    calls = min(calls, case.number)
+    tracemalloc.start()
+    try:
+        start_current, _ = tracemalloc.get_traced_memory()
+        peak_total = 0
+        for _ in range(calls):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            op()
+            _, peak = tracemalloc.get_traced_memory()
+            peak_total += peak - before
+        end_current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "peak_bytes": peak_total / calls,
+        "retained_bytes": max(end_current - start_current, 0) / calls,
+    }
+
+
+def run_case(case: Case, rounds: int, min_time: float = MIN_ROUND_SECONDS) -> Dict[str, float]:
+    ops_per_sec, relative_speed = time_case(case, rounds, min_time)
+    result = {"ops_per_sec": ops_per_sec, "relative_speed": relative_speed}
+    result.update(trace_case(case))
+    return result
@@ -0,0 +1,128 @@
+# benchmarks/run.py
+"""
+Run the microbenchmark suite and compare it against the stored baseline.
+
+Usage:
+    python -m benchmarks.run                    # compare, exit 1 on regressions
+    python -m benchmarks.run --update-baseline  # record new baseline numbers
+    python -m benchmarks.run -k create          # only cases whose name contains "create"
+
+A case regresses when its ops/sec drops, or its peak allocation per call grows,
+by more than the threshold (BENCH_THRESHOLD / BENCH_ALLOC_THRESHOLD, or the
+matching command-line options). Throughput is the median of --rounds rounds of
+at least --min-time seconds each. It is compared relative to a fixed
+calibration workload timed after every round, so a machine that is slower
+overall does not fail the run; a case that regresses is measured again and
+only reported if it regresses a second time. Baselines are machine
+specific; record them on the machine class that runs the comparison.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+from typing import Dict, List
+from benchmarks.cases import CASES
+from benchmarks.harness import MIN_ROUND_SECONDS, run_case
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def quiet_logging() -> None:
+    """Keep log records (their cost is part of the measurement) but do not print them"""
+    logger = logging.getLogger("url_shortener")
+    logger.handlers = [logging.NullHandler()]
+    logger.propagate = False
+
+
+def load_baseline() -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as f:
+        return json.load(f)["results"]
+
+
+def save_baseline(results: Dict[str, Dict[str, float]]) -> None:
+    data = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform()},
+        "results": {name: {key: float(f"{value:.6g}") for key, value in result.items()} for name, result in results.items()},
+    }
+    with open(BASELINE_PATH, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def find_regressions(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float,
+    alloc_threshold: float
+) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        # Compare speed relative to the calibration workload when both sides have it
+        key = "relative_speed" if "relative_speed" in result and "relative_speed" in base else "ops_per_sec"
+        if result[key] < base[key] * (1 - threshold):
+            regressions.append(
+                f"{name}: {result['ops_per_sec']:,.0f} ops/s vs baseline {base['ops_per_sec']:,.0f} "
+                f"({result[key] / base[key] - 1:+.0%} {key})"
+            )
+        # Ignore noise on tiny allocations
+        if result["peak_bytes"] > max(base["peak_bytes"] * (1 + alloc_threshold), base["peak_bytes"] + 64):
+            regressions.append(
+                f"{name}: {result['peak_bytes']:,.0f} peak B/call vs baseline {base['peak_bytes']:,.0f}"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=float(os.environ.get("BENCH_THRESHOLD", 0.25)))
+    parser.add_argument("--alloc-threshold", type=float, default=float(os.environ.get("BENCH_ALLOC_THRESHOLD", 0.10)))
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=MIN_ROUND_SECONDS)
+    parser.add_argument("-k", dest="keyword", default="")
+    args = parser.parse_args()
+
+    quiet_logging()
+    baseline = load_baseline()
+    results = {}
+    print(f"{'case':32} {'ops/sec':>12} {'baseline':>12} {'peak B/call':>12} {'retained B':>11}")
+    for case in CASES:
+        if args.keyword not in case.name:
+            continue
+        result = run_case(case, args.rounds, args.min_time)
+        results[case.name] = result
+        base = baseline.get(case.name, {}).get("ops_per_sec")
+        base_text = f"{base:,.0f}" if base else "-"
+        print(
+            f"{case.name:32} {result['ops_per_sec']:>12,.0f} {base_text:>12} "
+            f"{result['peak_bytes']:>12,.0f} {result['retained_bytes']:>11,.1f}"
+        )
+
+    if args.update_baseline:
+        save_baseline({**baseline, **results})
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+
+    regressions = []
+    for case in CASES:
+        if case.name not in results:
+            continue
+        if not find_regressions({case.name: results[case.name]}, baseline, args.threshold, args.alloc_threshold):
+            continue
+        # Confirm before failing: a single slow measurement is usually a noisy machine
+        rerun = {case.name: run_case(case, args.rounds, args.min_time)}
+        regressions.extend(find_regressions(rerun, baseline, args.threshold, args.alloc_threshold))
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
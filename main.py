@@ -4,11 +4,24 @@ from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from api.endpoints import router
-from app.db.base import engine
-from app.db.models import Base
+from api.admin import router as admin_router
+from app.db.base import engine, SessionLocal
+from app.db.schema import upgrade_schema
+from app.db.query_stats import track_queries
 from app.core.config import get_settings
 from app.core.logging import setup_logging, get_logger
+from app.core.profiling import profile_request
+from app.services.analytics import run_analytics_worker, run_rollup_cycle
+from app.services.cache import url_cache
+from app.services.code_index import run_code_index_worker
+from app.services.idempotency import run_idempotency_cleanup
+from app.services.link_checker import link_checker
+from app.services.segments import segment_store
+from app.services.tiering import run_tiering_worker
+from app.services.snapshot import load_snapshot, write_snapshot, run_snapshot_writer
 from contextlib import asynccontextmanager
+from sqlalchemy.exc import SQLAlchemyError
+import asyncio
 import os
 
 settings = get_settings()
@@ -27,13 +40,63 @@ async def lifespan(app: FastAPI):
     # Setup
     setup_logging()
     logger.info("Starting URL Shortener application")
-    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
     logger.info("Database tables created")
     
+    snapshot_tasks = []
+    if settings.SNAPSHOT_PATH:
+        # Warm the cache in the background so serving starts immediately
+        snapshot_tasks.append(asyncio.create_task(
+            asyncio.to_thread(load_snapshot, url_cache, settings.SNAPSHOT_PATH)
+        ))
+        snapshot_tasks.append(asyncio.create_task(run_snapshot_writer(
+            url_cache, settings.SNAPSHOT_PATH, settings.SNAPSHOT_INTERVAL, settings.SNAPSHOT_TOP_N
+        )))
+    analytics_task = None
+    if settings.ANALYTICS_ENABLED:
+        analytics_task = asyncio.create_task(
+            run_analytics_worker(SessionLocal, settings.ANALYTICS_FLUSH_INTERVAL)
+        )
+    tiering_task = None
+    if settings.SEGMENT_DIR and settings.TIERING_INTERVAL:
+        tiering_task = asyncio.create_task(run_tiering_worker(SessionLocal, settings.TIERING_INTERVAL))
+    code_index_task = None
+    if settings.CODE_INDEX_ENABLED:
+        # Availability checks query the database until the index has loaded
+        code_index_task = asyncio.create_task(run_code_index_worker(
+            SessionLocal, segment_store, settings.CODE_INDEX_REFRESH_INTERVAL
+        ))
+    if settings.LINK_CHECK_ENABLED:
+        await link_checker.start(SessionLocal)
+    idempotency_task = asyncio.create_task(
+        run_idempotency_cleanup(SessionLocal, settings.IDEMPOTENCY_CLEANUP_INTERVAL)
+    )
+    
     yield
     
     # Cleanup
     logger.info("Shutting down URL Shortener application")
+    for task in snapshot_tasks:
+        task.cancel()
+    await link_checker.stop()
+    idempotency_task.cancel()
+    if code_index_task:
+        code_index_task.cancel()
+    if tiering_task:
+        tiering_task.cancel()
+    segment_store.close()
+    if analytics_task:
+        analytics_task.cancel()
+        # Keep the clicks still buffered in this process
+        try:
+            run_rollup_cycle(SessionLocal, compact=False)
+        except SQLAlchemyError as e:
+            logger.error(f"Failed to flush click analytics: {str(e)}")
+    if settings.SNAPSHOT_PATH and len(url_cache):
+        try:
+            write_snapshot(url_cache, settings.SNAPSHOT_PATH, settings.SNAPSHOT_TOP_N)
+        except OSError as e:
+            logger.error(f"Failed to write cache snapshot: {str(e)}")
 
 # Initialize FastAPI application with detailed documentation
 app = FastAPI(
@@ -76,6 +139,15 @@ app = FastAPI(
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# Count database round trips per request (X-DB-* headers in debug mode)
+app.middleware("http")(track_queries)
+
+# Profile sampled or explicitly requested requests
+app.middleware("http")(profile_request)
+
+# Admin routes (require ADMIN_TOKEN)
+app.include_router(admin_router, prefix=settings.API_PREFIX)
+
 # Include API routes
 app.include_router(
     router,
@@ -4,6 +4,7 @@ setup(
     name="url-shortener",
     version="1.0.0",
     packages=find_packages(),
+    py_modules=["main"],
     install_requires=[
         "fastapi",
         "uvicorn",
@@ -20,4 +21,9 @@ setup(
         "httpx",
         "pytest-cov",
     ],
+    entry_points={
+        "console_scripts": [
+            "url-shortener=app.server:main",
+        ],
+    },
 )
\ No newline at end of file
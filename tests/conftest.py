@@ -1,11 +1,18 @@
 # tests/conftest.py
 import pytest
+from contextlib import contextmanager
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import get_settings
 from app.db.base import Base, get_db
+from app.db.query_stats import count_queries
 from app.main import app
+from app.services import compact
+from app.services.analytics import click_buffer
+from app.services.cache import url_cache
+from app.services.code_index import code_index
+from app.services.idempotency import idempotency_store
 from typing import Generator
 
 settings = get_settings()
@@ -38,6 +45,35 @@ def test_db():
     yield
     Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture(autouse=True)
+def isolated_cache(monkeypatch):
+    """
+    Starts every test with empty URL, domain and dictionary caches, no stored
+    idempotency keys, an unloaded code index and snapshots and click analytics disabled.
+    
+    Test transactions are rolled back, so entries cached by one test must not
+    leak into the next one. Snapshots and analytics are disabled so the
+    application lifespan neither writes a snapshot file nor flushes clicks to
+    the database in the working directory. Analytics tests enable it after the
+    client has started and flush into db_session themselves. The code index
+    would load from the application database, so index tests load it from
+    db_session.
+    """
+    monkeypatch.setattr(settings, "SNAPSHOT_PATH", None)
+    monkeypatch.setattr(settings, "ANALYTICS_ENABLED", False)
+    monkeypatch.setattr(settings, "CODE_INDEX_ENABLED", False)
+    url_cache.clear()
+    click_buffer.clear()
+    code_index.clear()
+    idempotency_store.clear()
+    compact.clear_caches()
+    yield
+    url_cache.clear()
+    click_buffer.clear()
+    code_index.clear()
+    idempotency_store.clear()
+    compact.clear_caches()
+
 @pytest.fixture(scope="function")
 def db_session(test_db) -> Generator:
     """
@@ -163,3 +199,30 @@ def valid_long_url_data():
     return {
         "target_url": "https://example.com/very/long/path/to/test"
     }
+
+@pytest.fixture
+def query_budget():
+    """
+    Asserts a maximum number of database round trips for a block of code.
+    
+    Round trips are executed statements plus commits on the test engine, so
+    requests made through the client fixture are counted too. Use it to pin
+    per-endpoint budgets so new queries on a hot path fail in CI.
+    
+    Example:
+        ```python
+        def test_redirect_budget(client, query_budget):
+            with query_budget(1) as stats:
+                client.get("/some-code")
+            assert stats.commits == 0
+        ```
+    """
+    @contextmanager
+    def budget(max_round_trips: int):
+        with count_queries(engine) as stats:
+            yield stats
+        statements = "\n".join(f"  {count}x {statement}" for statement, count in stats.statements.items())
+        assert stats.round_trips <= max_round_trips, (
+            f"{stats.round_trips} database round trips, budget is {max_round_trips}:\n{statements}"
+        )
+    return budget
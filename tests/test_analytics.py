@@ -0,0 +1,157 @@
+# tests/test_analytics.py
+from datetime import datetime, timedelta
+from fastapi import status
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.config import get_settings
+from app.db.models import HourlyClicks, DailyClicks
+from app.db.schema import upgrade_schema
+from app.services.analytics import (
+    ClickBuffer, click_buffer, flush_clicks, compact_rollups, get_click_buckets, hour_bucket
+)
+
+settings = get_settings()
+
+DAY_ONE = datetime(2024, 1, 7)
+
+
+def test_flush_accumulates_into_hourly_buckets(db_session):
+    """Test that repeated flushes add to existing rollup rows"""
+    buffer = ClickBuffer(max_pending=100)
+    for minute in (5, 10, 55):
+        buffer.record("abc123", DAY_ONE.replace(hour=12, minute=minute))
+    buffer.record("abc123", DAY_ONE.replace(hour=13))
+    assert flush_clicks(db_session, buffer) == 4
+
+    buffer.record("abc123", DAY_ONE.replace(hour=12, minute=30))
+    assert flush_clicks(db_session, buffer) == 1
+    assert len(buffer) == 0
+
+    rows = db_session.query(HourlyClicks).order_by(HourlyClicks.bucket).all()
+    assert [(row.bucket.hour, row.clicks) for row in rows] == [(12, 4), (13, 1)]
+
+
+def test_failed_flush_keeps_clicks(monkeypatch):
+    """Test that clicks survive a failed flush and are written by the next one"""
+    # A private database: the failed flush rolls back, which would end db_session's test transaction
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    upgrade_schema(engine)
+    db = sessionmaker(bind=engine)()
+    buffer = ClickBuffer(max_pending=100)
+    buffer.record("abc123", DAY_ONE)
+
+    def broken_commit():
+        raise OperationalError("COMMIT", {}, Exception("database is locked"))
+    with monkeypatch.context() as m:
+        m.setattr(db, "commit", broken_commit)
+        assert flush_clicks(db, buffer) == 0
+    assert len(buffer) == 1
+
+    assert flush_clicks(db, buffer) == 1
+    assert db.query(HourlyClicks).one().clicks == 1
+    db.close()
+
+
+def test_buffer_sheds_new_buckets_when_full():
+    """Test that a full buffer still counts existing buckets but drops new ones"""
+    buffer = ClickBuffer(max_pending=1)
+    buffer.record("first", DAY_ONE)
+    buffer.record("first", DAY_ONE)
+    buffer.record("second", DAY_ONE)
+
+    assert buffer.drain() == {("first", DAY_ONE): 2}
+
+
+def test_compaction_moves_old_hours_to_days(db_session):
+    """Test that hours before the cutoff day are folded into daily rows and deleted"""
+    buffer = ClickBuffer(max_pending=100)
+    for hour in (1, 2, 23):
+        buffer.record("abc123", DAY_ONE.replace(hour=hour))
+    buffer.record("abc123", DAY_ONE + timedelta(days=1, hours=3))
+    flush_clicks(db_session, buffer)
+
+    assert compact_rollups(db_session, before=DAY_ONE + timedelta(days=1, hours=12)) == 3
+
+    daily = db_session.query(DailyClicks).all()
+    assert [(row.bucket, row.clicks) for row in daily] == [(DAY_ONE, 3)]
+    hourly = db_session.query(HourlyClicks).all()
+    assert [row.bucket for row in hourly] == [DAY_ONE + timedelta(days=1, hours=3)]
+
+
+def test_daily_stats_combine_compacted_and_recent_buckets(db_session):
+    """Test that daily stats include both compacted days and days still held as hours"""
+    buffer = ClickBuffer(max_pending=100)
+    buffer.record("abc123", DAY_ONE.replace(hour=8))
+    buffer.record("abc123", DAY_ONE + timedelta(days=1, hours=8))
+    buffer.record("abc123", DAY_ONE + timedelta(days=1, hours=9))
+    flush_clicks(db_session, buffer)
+    compact_rollups(db_session, before=DAY_ONE + timedelta(days=1))
+
+    buckets = get_click_buckets(db_session, "abc123", "day", DAY_ONE, DAY_ONE + timedelta(days=7))
+    assert buckets == [(DAY_ONE, 1), (DAY_ONE + timedelta(days=1), 2)]
+
+    hours = get_click_buckets(db_session, "abc123", "hour", DAY_ONE, DAY_ONE + timedelta(days=7))
+    assert [clicks for _, clicks in hours] == [1, 1]
+
+
+class TestStatsEndpoint:
+    """GET /url/{short_url}/stats"""
+
+    def test_redirects_are_counted(self, client, db_session, valid_url_data, monkeypatch):
+        """Test that redirects show up in the stats once flushed"""
+        monkeypatch.setattr(settings, "ANALYTICS_ENABLED", True)
+        client.post("/url", json=valid_url_data)
+        for _ in range(3):
+            client.get(f"/{valid_url_data['custom_url']}")
+        flush_clicks(db_session)
+
+        response = client.get(f"/url/{valid_url_data['custom_url']}/stats", params={"granularity": "hour"})
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["total_clicks"] == 3
+        assert data["buckets"] == [
+            {"bucket": hour_bucket(datetime.utcnow()).isoformat(), "clicks": 3}
+        ]
+
+    def test_misses_are_not_counted(self, client, monkeypatch):
+        """Test that unknown short codes do not create click buckets"""
+        monkeypatch.setattr(settings, "ANALYTICS_ENABLED", True)
+        client.get("/missing")
+        assert len(click_buffer) == 0
+
+    def test_unknown_short_url(self, client):
+        """Test stats for a short code that does not exist"""
+        response = client.get("/url/missing/stats")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_explicit_range(self, client, db_session, valid_url_data):
+        """Test that the range is rounded out to whole buckets"""
+        client.post("/url", json=valid_url_data)
+        buffer = ClickBuffer(max_pending=100)
+        buffer.record(valid_url_data["custom_url"], DAY_ONE.replace(hour=12, minute=30))
+        flush_clicks(db_session, buffer)
+
+        response = client.get(
+            f"/url/{valid_url_data['custom_url']}/stats",
+            params={"granularity": "hour", "start": "2024-01-07T12:15:00", "end": "2024-01-07T12:45:00"}
+        )
+        data = response.json()
+        assert data["start"] == "2024-01-07T12:00:00"
+        assert data["end"] == "2024-01-07T13:00:00"
+        assert data["total_clicks"] == 1
+
+    def test_invalid_ranges(self, client, valid_url_data):
+        """Test reversed and oversized ranges"""
+        client.post("/url", json=valid_url_data)
+        stats_url = f"/url/{valid_url_data['custom_url']}/stats"
+
+        response = client.get(stats_url, params={"start": "2024-01-08T00:00:00", "end": "2024-01-07T00:00:00"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = client.get(stats_url, params={"granularity": "hour", "start": "2020-01-01T00:00:00"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = client.get(stats_url, params={"granularity": "minute"})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
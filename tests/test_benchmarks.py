@@ -0,0 +1,56 @@
+# tests/test_benchmarks.py
+from benchmarks.harness import Case, run_case, time_case
+from benchmarks.run import find_regressions
+
+BASELINE = {"case": {"ops_per_sec": 1000.0, "peak_bytes": 1000.0, "retained_bytes": 0.0}}
+
+
+def test_regression_past_threshold_is_reported():
+    """Test that a throughput drop beyond the threshold fails the comparison"""
+    results = {"case": {"ops_per_sec": 700.0, "peak_bytes": 1000.0, "retained_bytes": 0.0}}
+    assert len(find_regressions(results, BASELINE, threshold=0.25, alloc_threshold=0.1)) == 1
+
+
+def test_noise_within_threshold_is_ignored():
+    """Test that small slowdowns and new cases without a baseline pass"""
+    results = {
+        "case": {"ops_per_sec": 800.0, "peak_bytes": 1050.0, "retained_bytes": 0.0},
+        "new_case": {"ops_per_sec": 1.0, "peak_bytes": 1.0, "retained_bytes": 0.0},
+    }
+    assert find_regressions(results, BASELINE, threshold=0.25, alloc_threshold=0.1) == []
+
+
+def test_machine_slowdown_is_not_a_regression():
+    """Test that speed relative to the calibration workload is compared when recorded"""
+    baseline = {"case": {**BASELINE["case"], "relative_speed": 0.5}}
+    slower_machine = {"case": {**baseline["case"], "ops_per_sec": 500.0}}
+    slower_code = {"case": {**baseline["case"], "relative_speed": 0.3}}
+    assert find_regressions(slower_machine, baseline, threshold=0.25, alloc_threshold=0.1) == []
+    assert len(find_regressions(slower_code, baseline, threshold=0.25, alloc_threshold=0.1)) == 1
+
+
+def test_allocation_growth_is_reported():
+    """Test that growing peak allocations fail the comparison"""
+    results = {"case": {"ops_per_sec": 1000.0, "peak_bytes": 2000.0, "retained_bytes": 0.0}}
+    assert len(find_regressions(results, BASELINE, threshold=0.25, alloc_threshold=0.1)) == 1
+
+
+def test_run_case_reports_throughput_and_allocations():
+    """Test that the harness measures ops/sec and per-call allocations"""
+    case = Case("alloc", lambda: (lambda: bytearray(10_000)), number=50)
+    result = run_case(case, rounds=1)
+    assert result["ops_per_sec"] > 0 and result["relative_speed"] > 0
+    assert result["peak_bytes"] >= 10_000
+
+
+def test_rounds_repeat_until_min_time():
+    """Test that short batches are repeated on fresh state until a round is long enough"""
+    setups = []
+
+    def setup():
+        setups.append(1)
+        return lambda: None
+    ops_per_sec, _ = time_case(Case("tiny", setup, number=10), rounds=3, min_time=0.01)
+    assert ops_per_sec > 0
+    # One discarded round plus three timed rounds, each needing several batches
+    assert len(setups) > 4
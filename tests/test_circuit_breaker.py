@@ -0,0 +1,135 @@
+# tests/test_circuit_breaker.py
+import time
+import pytest
+from fastapi import status
+from sqlalchemy.exc import OperationalError
+from app.core import metrics
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, HALF_OPEN, OPEN
+from app.core.config import get_settings
+from app.db.base import db_breaker
+from app.services.cache import url_cache
+
+settings = get_settings()
+
+
+def make_breaker(**overrides):
+    options = {
+        "failure_threshold": 2,
+        "reset_timeout": 60,
+        "slow_call_threshold": 1.0,
+        "failure_exceptions": (OperationalError,),
+    }
+    options.update(overrides)
+    return CircuitBreaker("test", **options)
+
+
+def fail(breaker):
+    with pytest.raises(OperationalError):
+        with breaker.call():
+            raise OperationalError("SELECT 1", {}, Exception("database is locked"))
+
+
+@pytest.fixture
+def open_db_circuit():
+    """
+    Trips the shared database breaker for one test and closes it afterwards.
+
+    Example:
+        ```python
+        def test_degraded(client, open_db_circuit):
+            response = client.post("/url", json={"target_url": "https://example.com"})
+            assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        ```
+    """
+    for _ in range(db_breaker.failure_threshold):
+        db_breaker.record_failure()
+    assert db_breaker.state == OPEN
+    yield db_breaker
+    db_breaker.record_success()
+
+
+def test_breaker_opens_after_consecutive_failures():
+    """Test that the breaker trips at the threshold and rejects calls"""
+    breaker = make_breaker()
+    fail(breaker)
+    assert breaker.state == CLOSED
+    fail(breaker)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError) as excinfo:
+        with breaker.call():
+            pass
+    assert 1 <= excinfo.value.retry_after <= 60
+
+
+def test_breaker_success_resets_failure_count():
+    """Test that only consecutive failures count"""
+    breaker = make_breaker()
+    fail(breaker)
+    with breaker.call():
+        pass
+    fail(breaker)
+    assert breaker.state == CLOSED
+
+
+def test_breaker_half_open_trial_closes_or_reopens():
+    """Test that a trial call after the reset timeout decides the next state"""
+    breaker = make_breaker(reset_timeout=0)
+    fail(breaker)
+    fail(breaker)
+    assert breaker.state == HALF_OPEN
+
+    fail(breaker)
+    assert breaker._state == OPEN
+
+    with breaker.call():
+        pass
+    assert breaker.state == CLOSED
+
+
+def test_slow_calls_count_as_failures():
+    """Test that calls slower than the threshold trip the breaker"""
+    breaker = make_breaker(failure_threshold=1, slow_call_threshold=0.01)
+    with breaker.call():
+        time.sleep(0.02)
+    assert breaker.state == OPEN
+
+
+def test_non_database_errors_do_not_trip():
+    """Test that application errors raised inside a call count as success"""
+    breaker = make_breaker(failure_threshold=1)
+    with pytest.raises(ValueError):
+        with breaker.call():
+            raise ValueError("bad input")
+    assert breaker.state == CLOSED
+
+
+class TestDegradedMode:
+    """Test suite for API behaviour while the database circuit is open."""
+
+    def test_cached_redirect_is_served(self, client, open_db_circuit):
+        """Test that cached short codes keep redirecting"""
+        url_cache.put("cached1", "https://example.com/cached")
+        response = client.get("/cached1")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["url"] == "https://example.com/cached"
+
+    def test_uncached_redirect_fails_fast(self, client, open_db_circuit):
+        """Test that uncached short codes get a 503 with Retry-After"""
+        response = client.get("/uncached")
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert int(response.headers["Retry-After"]) >= 1
+
+    def test_create_fails_fast(self, client, valid_url_data, open_db_circuit):
+        """Test that creates get a 503 with Retry-After"""
+        response = client.post("/url", json=valid_url_data)
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert "Retry-After" in response.headers
+
+    def test_breaker_state_in_metrics(self, client, open_db_circuit, monkeypatch):
+        """Test that the breaker state is exported"""
+        monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret-token")
+        response = client.get("/admin/metrics", headers={settings.ADMIN_TOKEN_HEADER: "secret-token"})
+        assert response.status_code == status.HTTP_200_OK
+        assert 'circuit_breaker_state{breaker="database"} 2' in response.text
+        assert metrics.render().count("# TYPE circuit_breaker_state gauge") == 1
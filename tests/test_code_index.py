@@ -0,0 +1,124 @@
+# tests/test_code_index.py
+from datetime import datetime
+from fastapi import status
+from app.core.config import get_settings
+from app.db.models import URL
+from app.services.code_index import CodeIndex, code_index
+from app.services.segments import SegmentEntry, SegmentStore, write_segment
+from app.services.shortener import suggestion_candidates
+
+settings = get_settings()
+
+
+def add_url(db_session, short_url, created_at=None):
+    db_session.add(URL(short_url=short_url, original_url=f"https://example.com/{short_url}", is_custom=True,
+                       created_at=created_at or datetime.utcnow()))
+    db_session.commit()
+
+
+def test_index_membership_across_compaction():
+    """Test that codes are found before and after recent codes are merged in"""
+    index = CodeIndex(merge_threshold=2)
+    index.ready = True
+    for code in ("beta", "alpha", "gamma", "alpha"):
+        index.add(code)
+    assert len(index) == 3
+    assert "alpha" in index and "delta" not in index
+
+    index.compact()
+    assert index._codes == ["alpha", "beta", "gamma"]
+    assert index.add("delta") is True
+    assert "delta" in index and "gamma" in index
+
+
+def test_load_includes_table_and_segment_codes(db_session, tmp_path):
+    """Test that loading indexes codes from the table and from cold segments"""
+    add_url(db_session, "hot-link")
+    store = SegmentStore(str(tmp_path))
+    write_segment(store.new_path(), [
+        SegmentEntry("cold-link", "https://example.com/cold", True, datetime(2024, 1, 7))
+    ], capacity=1)
+
+    index = CodeIndex(merge_threshold=100)
+    assert index.load(db_session, store) == 2
+    assert "hot-link" in index and "cold-link" in index
+    store.close()
+
+
+def test_refresh_picks_up_codes_from_other_workers(db_session, tmp_path):
+    """Test that rows inserted behind the index's back appear after a refresh"""
+    add_url(db_session, "first")
+    index = CodeIndex(merge_threshold=100)
+    index.load(db_session, SegmentStore(str(tmp_path)))
+
+    add_url(db_session, "second")
+    assert "second" not in index
+    assert index.refresh(db_session) == 1
+    assert "second" in index
+
+
+def test_suggestion_candidates_stay_valid():
+    """Test that variants fit the length limit and never start with a hyphen"""
+    long_code = "a" * settings.MAX_CUSTOM_URL_LENGTH
+    candidates = suggestion_candidates(long_code)
+    assert candidates[:2] == [long_code[:-1] + "1", long_code[:-2] + "-1"]
+    assert all(len(candidate) <= settings.MAX_CUSTOM_URL_LENGTH for candidate in candidates)
+    assert suggestion_candidates("ab")[:2] == ["ab-1", "ab-2"]
+    assert suggestion_candidates("---") == []
+
+
+class TestAvailabilityEndpoint:
+    """GET /custom/available"""
+
+    def test_batch_check(self, client, valid_url_data):
+        """Test that free, taken and invalid codes are reported together"""
+        client.post("/url", json=valid_url_data)
+        client.post("/url", json={"target_url": "https://example.org", "custom_url": "test-url1"})
+
+        response = client.get("/custom/available", params={"code": ["free-code", "test-url", "admin"]})
+        assert response.status_code == status.HTTP_200_OK
+        free, taken, reserved = response.json()["results"]
+        assert free == {"custom_url": "free-code", "available": True, "reason": None, "suggestions": []}
+        assert (taken["available"], taken["reason"]) == (False, "taken")
+        assert taken["suggestions"] == ["test-url-1", "test-url2", "test-url-2"]
+        assert (reserved["reason"], reserved["suggestions"]) == ("invalid", ["admin1", "admin-1", "admin2"])
+
+    def test_answered_from_index_without_queries(self, client, db_session, valid_url_data, query_budget, tmp_path):
+        """Test that a loaded index answers without touching the database and sees new codes"""
+        code_index.load(db_session, SegmentStore(str(tmp_path)))
+        client.post("/url", json=valid_url_data)
+
+        with query_budget(0):
+            response = client.get("/custom/available", params={"code": ["test-url", "other"], "suggestions": 1})
+        taken, free = response.json()["results"]
+        assert (taken["available"], taken["suggestions"]) == (False, ["test-url1"])
+        assert free["available"] is True
+
+    def test_fallback_is_one_query(self, client, query_budget):
+        """Test that before the index loads, all codes and suggestions cost one query"""
+        with query_budget(1):
+            response = client.get("/custom/available", params={"code": [f"code-{i}" for i in range(10)]})
+        assert all(result["available"] for result in response.json()["results"])
+
+    def test_empty_code_is_invalid(self, client):
+        """Test that an empty code is reported invalid rather than available"""
+        response = client.get("/custom/available", params={"code": ""})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["results"] == [
+            {"custom_url": "", "available": False, "reason": "invalid", "suggestions": []}
+        ]
+
+    def test_too_many_codes(self, client):
+        """Test that oversized batches are rejected"""
+        codes = [f"code-{i}" for i in range(settings.CUSTOM_CHECK_MAX_CODES + 1)]
+        response = client.get("/custom/available", params={"code": codes})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_create_rejects_indexed_code(self, client, db_session, valid_url_data, tmp_path):
+        """Test that a code already in the index is refused"""
+        code_index.load(db_session, SegmentStore(str(tmp_path)))
+        client.post("/url", json=valid_url_data)
+
+        response = client.post("/url", json={**valid_url_data, "target_url": "https://example.org"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"] == "Custom URL is already taken"
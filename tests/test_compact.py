@@ -0,0 +1,99 @@
+# tests/test_compact.py
+import pytest
+from fastapi import status
+from app.core.config import get_settings
+from app.db.migrate_compact import migrate
+from app.db.models import URL, Domain
+from app.services import compact
+from app.services.cache import url_cache
+from app.services.shortener import fetch_original_url, get_url_by_shortcode
+
+settings = get_settings()
+
+CORPUS = [
+    "https://shop.example.com/products/1234?utm_source=newsletter&utm_medium=email&utm_campaign=spring",
+    "https://shop.example.com/products/5678?utm_source=newsletter&utm_medium=email&utm_campaign=summer",
+    "https://news.example.org/articles/2024/01/some-headline?ref=homepage",
+    "https://news.example.org/articles/2024/02/another-headline?ref=homepage",
+    "https://example.com",
+]
+
+
+@pytest.fixture
+def compact_storage(monkeypatch):
+    """
+    Turns on compact storage for newly created URLs.
+
+    Example:
+        ```python
+        def test_compact_create(client, compact_storage):
+            client.post("/url", json={"target_url": "https://example.com/a"})
+        ```
+    """
+    monkeypatch.setattr(settings, "URL_COMPACT_STORAGE", True)
+
+
+@pytest.mark.parametrize("url", CORPUS)
+def test_path_round_trip(url):
+    """Test that encoding and decoding returns the original URL"""
+    prefix, rest = compact.split_url(url)
+    assert prefix + rest == url
+    blob = compact.encode_path(rest, compact.DEFAULT_DICTIONARY)
+    assert compact.decode_path(blob, compact.DEFAULT_DICTIONARY) == rest
+
+
+def test_repetitive_query_strings_shrink():
+    """Test that common tracking parameters compress below their raw size"""
+    _, rest = compact.split_url(CORPUS[0])
+    assert len(compact.encode_path(rest, compact.DEFAULT_DICTIONARY)) < len(rest)
+
+
+def test_trained_dictionary_covers_corpus_fragments():
+    """Test that training keeps fragments repeated across the corpus"""
+    dictionary = compact.train_dictionary(CORPUS)
+    assert b"utm_source=" in dictionary
+    assert b"/products" in dictionary
+    _, rest = compact.split_url(CORPUS[1])
+    assert len(compact.encode_path(rest, dictionary)) < len(rest) // 2
+
+
+def test_domains_are_interned(db_session):
+    """Test that URLs on the same host share one domain row"""
+    first = compact.compact_fields(db_session, CORPUS[0])
+    second = compact.compact_fields(db_session, CORPUS[1])
+    assert first["domain_id"] == second["domain_id"]
+    assert db_session.query(Domain).count() == 1
+
+
+def test_migration_keeps_lookups_transparent(db_session):
+    """Test that migrated rows decode to the same URLs"""
+    for i, url in enumerate(CORPUS):
+        db_session.add(URL(original_url=url, short_url=f"code{i}"))
+    db_session.commit()
+
+    assert migrate(db_session, batch_size=2) == len(CORPUS)
+    assert db_session.query(URL).filter(URL.original_url.is_not(None)).count() == 0
+    for i, url in enumerate(CORPUS):
+        assert fetch_original_url(db_session, f"code{i}") == url
+        assert get_url_by_shortcode(db_session, f"code{i}") == url
+
+
+def test_compact_create_and_redirect(client, db_session, compact_storage):
+    """Test that compactly stored URLs round-trip through the API"""
+    target = CORPUS[0]
+    response = client.post("/url", json={"target_url": target})
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["target_url"] == target
+    short_url = response.json()["short_url"]
+
+    record = db_session.query(URL).filter(URL.short_url == short_url).one()
+    assert record.original_url is None
+    assert record.compressed_path is not None
+
+    # Deduplication still finds the compact row
+    again = client.post("/url", json={"target_url": target})
+    assert again.json()["short_url"] == short_url
+
+    compact.clear_caches()
+    url_cache.clear()
+    assert client.get(f"/{short_url}").json()["url"] == target
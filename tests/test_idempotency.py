@@ -0,0 +1,166 @@
+# tests/test_idempotency.py
+import asyncio
+from datetime import datetime, timedelta
+import time
+import httpx
+import pytest
+from fastapi import HTTPException, status
+from api import endpoints
+from app.db.models import IdempotencyKey
+from app.services.idempotency import IdempotencyStore, idempotency_store, purge_idempotency_keys
+
+
+def test_retry_replays_without_queries(client, valid_long_url_data, query_budget):
+    """Test that a retry with the same key replays the first response with no database work"""
+    headers = {"Idempotency-Key": "retry-1"}
+    first = client.post("/url", json=valid_long_url_data, headers=headers)
+    assert first.status_code == status.HTTP_201_CREATED
+
+    with query_budget(0):
+        retry = client.post("/url", json=valid_long_url_data, headers=headers)
+    assert retry.status_code == status.HTTP_201_CREATED
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+
+
+def test_custom_url_retry_is_not_taken(client, valid_url_data):
+    """Test that retrying a committed custom create succeeds instead of reporting the code taken"""
+    headers = {"Idempotency-Key": "retry-2"}
+    assert client.post("/url", json=valid_url_data, headers=headers).status_code == status.HTTP_201_CREATED
+
+    assert client.post("/url", json=valid_url_data, headers=headers).status_code == status.HTTP_201_CREATED
+    assert client.post("/url", json=valid_url_data).status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_key_reused_with_another_body(client, valid_url_data):
+    """Test that a key cannot be replayed for a different request"""
+    headers = {"Idempotency-Key": "retry-3"}
+    client.post("/url", json=valid_url_data, headers=headers)
+
+    response = client.post("/url", json={**valid_url_data, "custom_url": "other-url"}, headers=headers)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_overlapping_requests_create_once(client, valid_url_data, monkeypatch):
+    """Test that a retry arriving while the first request is still creating waits for it"""
+    calls = []
+    create_once = endpoints.create_url_record_once
+
+    def slow_create(*args):
+        calls.append(1)
+        time.sleep(0.1)
+        return create_once(*args)
+    monkeypatch.setattr(endpoints, "create_url_record_once", slow_create)
+
+    async def run():
+        async with httpx.AsyncClient(app=client.app, base_url="http://test") as http:
+            return await asyncio.gather(*(
+                http.post("/url", json=valid_url_data, headers={"Idempotency-Key": "retry-7"}) for _ in range(3)
+            ))
+
+    responses = asyncio.run(run())
+    assert len(calls) == 1
+    assert [response.status_code for response in responses] == [status.HTTP_201_CREATED] * 3
+    assert sum("Idempotent-Replayed" in response.headers for response in responses) == 2
+
+
+def test_retry_on_another_worker_replays(client, valid_long_url_data, valid_url_data):
+    """Test that a retry reaching a worker without the key in memory replays from the database"""
+    for key, data in (("retry-4", valid_long_url_data), ("retry-5", valid_url_data)):
+        headers = {"Idempotency-Key": key}
+        first = client.post("/url", json=data, headers=headers)
+        assert first.status_code == status.HTTP_201_CREATED
+        # Another worker: nothing in its memory
+        idempotency_store.clear()
+
+        retry = client.post("/url", json=data, headers=headers)
+        assert retry.status_code == status.HTTP_201_CREATED
+        assert retry.json() == first.json()
+        assert retry.headers["Idempotent-Replayed"] == "true"
+
+    idempotency_store.clear()
+    response = client.post("/url", json={**valid_url_data, "custom_url": "other-url"},
+                           headers={"Idempotency-Key": "retry-5"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_empty_key_is_rejected(client, valid_url_data):
+    """Test that an empty Idempotency-Key is a validation error rather than a key"""
+    response = client.post("/url", json=valid_url_data, headers={"Idempotency-Key": ""})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_expired_keys_are_reusable_and_purged(client, db_session, valid_url_data):
+    """Test that a key past its TTL runs again and expired rows are deleted"""
+    headers = {"Idempotency-Key": "retry-6"}
+    client.post("/url", json=valid_url_data, headers=headers)
+    idempotency_store.clear()
+    row = db_session.get(IdempotencyKey, "retry-6")
+    row.created_at = datetime.utcnow() - timedelta(days=1)
+    db_session.commit()
+
+    response = client.post("/url", json={**valid_url_data, "custom_url": "other-url"}, headers=headers)
+    assert response.status_code == status.HTTP_201_CREATED
+    assert "Idempotent-Replayed" not in response.headers
+
+    db_session.get(IdempotencyKey, "retry-6").created_at = datetime.utcnow() - timedelta(days=1)
+    db_session.commit()
+    assert purge_idempotency_keys(db_session, datetime.utcnow() - timedelta(hours=1)) == 1
+    assert db_session.get(IdempotencyKey, "retry-6") is None
+
+
+def test_concurrent_requests_share_one_execution():
+    """Test that requests racing on one key run the create once"""
+    store = IdempotencyStore(max_entries=10, ttl=60)
+    calls = []
+
+    async def execute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"short_url": "abc123"}
+
+    async def run():
+        return await asyncio.gather(*(store.run("key", "body", execute) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert [replayed for _, replayed in results] == [False, True, True, True, True]
+    assert all(result == {"short_url": "abc123"} for result, _ in results)
+
+
+def test_failures_are_shared_but_not_stored():
+    """Test that waiters see the failure and the next request runs again"""
+    store = IdempotencyStore(max_entries=10, ttl=60)
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise HTTPException(status_code=503, detail="Service temporarily unavailable")
+
+    async def succeed():
+        return "created"
+
+    async def run():
+        outcomes = await asyncio.gather(store.run("key", "body", fail), store.run("key", "body", fail),
+                                        return_exceptions=True)
+        return outcomes, await store.run("key", "body", succeed)
+
+    outcomes, retried = asyncio.run(run())
+    assert all(isinstance(outcome, HTTPException) and outcome.status_code == 503 for outcome in outcomes)
+    assert retried == ("created", False)
+
+
+def test_store_is_bounded_and_expires():
+    """Test that entries are evicted past max_entries and after the TTL"""
+    store = IdempotencyStore(max_entries=2, ttl=60)
+    for key in ("a", "b", "c"):
+        store.put(key, "body", key)
+    assert store.get("a", "body") is None
+    assert store.get("c", "body") == "c"
+    with pytest.raises(HTTPException):
+        store.get("c", "other body")
+
+    expired = IdempotencyStore(max_entries=2, ttl=0)
+    expired.put("a", "body", "a")
+    assert expired.get("a", "body") is None
+    assert len(expired) == 0
@@ -0,0 +1,248 @@
+# tests/test_link_checker.py
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from fastapi import status
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.config import get_settings
+from app.db.models import LinkCheck
+from app.db.schema import upgrade_schema
+from app.services import link_checker as link_checker_module
+from app.services.link_checker import LinkChecker, extract_title
+
+settings = get_settings()
+
+SLOW_SECONDS = 1.0
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Targets for the checker: pages with titles, a dead link, a redirect and a slow page"""
+
+    def do_GET(self):
+        if self.path == "/ok":
+            self.reply(200, b"<html><head><title> Stub &amp; Page </title></head><body>hi</body></html>")
+        elif self.path == "/redirect":
+            self.send_response(301)
+            self.send_header("Location", "/ok")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif self.path == "/bad-charset":
+            self.reply(200, b"<title>Odd Charset</title>", content_type="text/html; charset=bogus")
+        elif self.path == "/host":
+            self.reply(200, f"<title>{self.headers['Host']}</title>".encode())
+        elif self.path == "/slow":
+            time.sleep(SLOW_SECONDS)
+            self.reply(200, b"<title>Slow</title>")
+        else:
+            self.reply(404, b"<title>Not Found</title>")
+
+    def reply(self, code, body, content_type="text/html; charset=utf-8"):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    """
+    Serves stub targets on a local port and allows checks of loopback addresses.
+
+    Example:
+        ```python
+        def test_check(stub_server):
+            url = f"http://127.0.0.1:{stub_server}/ok"
+        ```
+    """
+    monkeypatch.setattr(settings, "LINK_CHECK_ALLOW_PRIVATE", True)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def check_db():
+    """
+    A private in-memory database for checker results, written from worker threads.
+
+    Example:
+        ```python
+        async def run(check_db):
+            await checker.start(check_db)
+        ```
+    """
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    upgrade_schema(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def make_checker(**overrides):
+    options = dict(
+        queue_size=100, concurrency=4, per_host=2, timeout=3.0,
+        max_bytes=4096, batch_size=100, flush_interval=0.05
+    )
+    options.update(overrides)
+    return LinkChecker(**options)
+
+
+def stored_checks(session_factory):
+    db = session_factory()
+    try:
+        return {check.short_url: check for check in db.query(LinkCheck).all()}
+    finally:
+        db.close()
+
+
+async def wait_for_checks(session_factory, codes, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        checks = stored_checks(session_factory)
+        if set(codes) <= checks.keys():
+            return checks
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"Checks not stored in time: {set(codes) - stored_checks(session_factory).keys()}")
+
+
+def test_extract_title():
+    """Test that titles are unescaped, whitespace-collapsed and missing titles give None"""
+    assert extract_title(b"<TITLE lang='en'>\n A &lt;b&gt;\n</title>", "utf-8") == "A <b>"
+    assert extract_title(b"<html><body>no title</body></html>", None) is None
+
+
+def test_results_are_stored(stub_server, check_db):
+    """Test that live, dead and redirected targets are stored with status and title"""
+    base = f"http://127.0.0.1:{stub_server}"
+
+    async def run():
+        checker = make_checker()
+        await checker.start(check_db)
+        assert checker.submit("live", f"{base}/ok")
+        assert checker.submit("dead", f"{base}/missing")
+        assert checker.submit("moved", f"{base}/redirect")
+        checks = await wait_for_checks(check_db, ["live", "dead", "moved"])
+        await checker.stop()
+        return checks
+
+    checks = asyncio.run(run())
+    assert (checks["live"].status_code, checks["live"].title) == (200, "Stub & Page")
+    assert checks["live"].is_dead is False
+    assert (checks["dead"].status_code, checks["dead"].title) == (404, None)
+    assert checks["dead"].is_dead is True
+    assert (checks["moved"].status_code, checks["moved"].title) == (200, "Stub & Page")
+
+
+def test_unusual_responses_still_store_results(stub_server, check_db):
+    """Test that an unknown charset or an invalid URL still produces a stored result"""
+    async def run():
+        checker = make_checker()
+        await checker.start(check_db)
+        checker.submit("charset", f"http://127.0.0.1:{stub_server}/bad-charset")
+        checker.submit("invalid", "http://exa mple.com:99999/")
+        checks = await wait_for_checks(check_db, ["charset", "invalid"])
+        await checker.stop()
+        return checks
+
+    checks = asyncio.run(run())
+    assert (checks["charset"].status_code, checks["charset"].title) == (200, "Odd Charset")
+    assert (checks["invalid"].status_code, checks["invalid"].error is not None) == (None, True)
+
+
+def test_connects_to_vetted_address(stub_server, check_db, monkeypatch):
+    """Test that the connection goes to the resolved address while keeping the original Host"""
+    async def resolve(host):
+        assert host == "rebind.invalid"
+        return "127.0.0.1"
+    monkeypatch.setattr(link_checker_module, "resolve_address", resolve)
+
+    async def run():
+        checker = make_checker()
+        await checker.start(check_db)
+        checker.submit("pinned", f"http://rebind.invalid:{stub_server}/host")
+        checks = await wait_for_checks(check_db, ["pinned"])
+        await checker.stop()
+        return checks
+
+    check = asyncio.run(run())["pinned"]
+    assert (check.status_code, check.title) == (200, f"rebind.invalid:{stub_server}")
+
+
+def test_slow_host_does_not_block_others(stub_server, check_db):
+    """Test that a backlog for a slow host does not delay checks for another host"""
+    async def run():
+        checker = make_checker(per_host=1, concurrency=2)
+        await checker.start(check_db)
+        for i in range(5):
+            checker.submit(f"slow{i}", f"http://127.0.0.1:{stub_server}/slow")
+        started = time.monotonic()
+        checker.submit("fast", f"http://localhost:{stub_server}/ok")
+        checks = await wait_for_checks(check_db, ["fast"])
+        elapsed = time.monotonic() - started
+        await checker.stop()
+        return checks, elapsed
+
+    checks, elapsed = asyncio.run(run())
+    assert checks["fast"].status_code == 200
+    assert elapsed < SLOW_SECONDS
+    assert not any(code.startswith("slow") for code in checks)
+
+
+def test_backlog_is_bounded(stub_server, check_db):
+    """Test that submissions past the queue size are rejected instead of queued"""
+    async def run():
+        checker = make_checker(queue_size=2, concurrency=1, per_host=1)
+        await checker.start(check_db)
+        accepted = [checker.submit(f"code{i}", f"http://127.0.0.1:{stub_server}/slow") for i in range(4)]
+        backlog = checker.backlog
+        await checker.stop()
+        return accepted, backlog
+
+    accepted, backlog = asyncio.run(run())
+    assert accepted == [True, True, False, False]
+    assert backlog == 2
+
+
+def test_private_addresses_are_blocked(stub_server, check_db, monkeypatch):
+    """Test that targets on loopback addresses are not fetched unless allowed"""
+    monkeypatch.setattr(settings, "LINK_CHECK_ALLOW_PRIVATE", False)
+
+    async def run():
+        checker = make_checker()
+        await checker.start(check_db)
+        checker.submit("internal", f"http://127.0.0.1:{stub_server}/ok")
+        checks = await wait_for_checks(check_db, ["internal"])
+        await checker.stop()
+        return checks
+
+    check = asyncio.run(run())["internal"]
+    assert (check.status_code, check.error) == (None, "blocked_address")
+
+
+def test_submit_without_running_checker():
+    """Test that submissions are refused while the checker is stopped"""
+    assert make_checker().submit("abc123", "https://example.com") is False
+
+
+def test_create_enqueues_check(client, monkeypatch):
+    """Test that creating a URL hands the target to the checker"""
+    submitted = []
+    monkeypatch.setattr(
+        link_checker_module.link_checker, "submit",
+        lambda short_url, target_url: submitted.append((short_url, target_url)) or True
+    )
+
+    response = client.post("/url", json={"target_url": "https://example.com/page", "custom_url": "checked"})
+    assert response.status_code == status.HTTP_201_CREATED
+    assert submitted == [("checked", "https://example.com/page")]
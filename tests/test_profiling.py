@@ -0,0 +1,92 @@
+# tests/test_profiling.py
+import pytest
+from fastapi import status
+from app.core.config import get_settings
+from app.core.profiling import ProfileStore, RequestProfile, phase, profile_store
+
+settings = get_settings()
+
+
+@pytest.fixture
+def admin_token(monkeypatch, tmp_path):
+    """
+    Enables admin endpoints and redirects the profile ring to a temp directory.
+
+    Example:
+        ```python
+        def test_profiled_request(client, admin_token):
+            response = client.get("/abcd", headers={settings.PROFILE_HEADER: admin_token})
+            assert "X-Profile-Id" in response.headers
+        ```
+    """
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret-token")
+    monkeypatch.setattr(profile_store, "directory", str(tmp_path))
+    return "secret-token"
+
+
+def test_profile_store_keeps_bounded_ring(tmp_path):
+    """Test that the store drops the oldest profiles past max_files"""
+    store = ProfileStore(str(tmp_path), max_files=3)
+    ids = []
+    for _ in range(5):
+        profile = RequestProfile("GET", "/abcd")
+        profile.profiler.enable()
+        profile.profiler.disable()
+        ids.append(store.save(profile))
+
+    listed = [entry["id"] for entry in store.list()]
+    assert listed == list(reversed(ids[-3:]))
+    assert store.path_for(ids[0]) is None
+    assert store.path_for(ids[-1]) is not None
+
+
+def test_profile_store_rejects_path_traversal(tmp_path):
+    """Test that profile ids cannot escape the profile directory"""
+    store = ProfileStore(str(tmp_path), max_files=3)
+    assert store.path_for("../../etc/passwd") is None
+
+
+def test_phase_is_noop_without_profile():
+    """Test that phases outside a profiled request do nothing"""
+    with phase("validation"):
+        pass
+
+
+class TestProfilingEndpoints:
+    """Test suite for the profiling middleware and admin endpoints."""
+
+    def test_trusted_header_profiles_request(self, client, valid_url_data, admin_token):
+        """Test that a trusted header produces a downloadable profile with phases"""
+        response = client.post(
+            "/url",
+            json=valid_url_data,
+            headers={settings.PROFILE_HEADER: admin_token}
+        )
+        profile_id = response.headers["X-Profile-Id"]
+
+        listing = client.get("/admin/profiles", headers={settings.ADMIN_TOKEN_HEADER: admin_token})
+        assert listing.status_code == status.HTTP_200_OK
+        entry = listing.json()[0]
+        assert entry["id"] == profile_id
+        assert entry["path"] == "/url"
+        assert {"validation", "db_query", "commit"} <= set(entry["phases"])
+
+        download = client.get(
+            f"/admin/profiles/{profile_id}",
+            headers={settings.ADMIN_TOKEN_HEADER: admin_token}
+        )
+        assert download.status_code == status.HTTP_200_OK
+        assert len(download.content) > 0
+
+    def test_untrusted_header_is_not_profiled(self, client, valid_url_data, admin_token):
+        """Test that a wrong token neither profiles nor opens the admin endpoints"""
+        response = client.post("/url", json=valid_url_data, headers={settings.PROFILE_HEADER: "wrong"})
+        assert "X-Profile-Id" not in response.headers
+
+        listing = client.get("/admin/profiles", headers={settings.ADMIN_TOKEN_HEADER: "wrong"})
+        assert listing.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_admin_disabled_without_token(self, client):
+        """Test that admin endpoints are hidden when no token is configured"""
+        response = client.get("/admin/profiles")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,76 @@
+# tests/test_query_budget.py
+from app.core.config import get_settings
+from app.db.query_stats import QueryStats
+from app.services.cache import url_cache
+
+settings = get_settings()
+
+
+class TestQueryBudgets:
+    """
+    Per-endpoint database round-trip budgets.
+
+    Raise a budget only together with a deliberate change to the endpoint; a
+    failure here usually means a new query slipped onto a hot path.
+    """
+
+    def test_redirect_uncached(self, client, valid_url_data, query_budget):
+        """Test that an uncached redirect costs at most one query"""
+        client.post("/url", json=valid_url_data)
+        url_cache.clear()
+        with query_budget(1):
+            client.get(f"/{valid_url_data['custom_url']}")
+
+    def test_redirect_cached(self, client, valid_url_data, query_budget):
+        """Test that a cached redirect does not touch the database"""
+        client.post("/url", json=valid_url_data)
+        with query_budget(0):
+            client.get(f"/{valid_url_data['custom_url']}")
+
+    def test_redirect_missing(self, client, query_budget):
+        """Test that a miss costs one query"""
+        with query_budget(1):
+            client.get("/missing")
+
+    def test_create(self, client, valid_long_url_data, query_budget):
+        """Test that a create costs at most the dedupe SELECT, INSERT, COMMIT and refresh"""
+        with query_budget(4):
+            client.post("/url", json=valid_long_url_data)
+
+    def test_create_duplicate(self, client, valid_long_url_data, query_budget):
+        """Test that re-creating an existing URL only costs the dedupe SELECT"""
+        client.post("/url", json=valid_long_url_data)
+        with query_budget(1):
+            client.post("/url", json=valid_long_url_data)
+
+    def test_stats(self, client, valid_url_data, query_budget):
+        """Test that daily stats read the two rollup tables and nothing else"""
+        client.post("/url", json=valid_url_data)
+        with query_budget(2):
+            client.get(f"/url/{valid_url_data['custom_url']}/stats")
+
+
+def test_debug_mode_exposes_query_headers(client, monkeypatch):
+    """Test that debug mode returns per-request query counts"""
+    monkeypatch.setattr(settings, "DEBUG", True)
+    response = client.get("/missing")
+    assert response.headers["X-DB-Queries"] == "1"
+    assert float(response.headers["X-DB-Time-ms"]) >= 0
+
+
+def test_query_headers_hidden_outside_debug(client, monkeypatch):
+    """Test that production responses do not leak query counts"""
+    monkeypatch.setattr(settings, "DEBUG", False)
+    response = client.get("/missing")
+    assert "X-DB-Queries" not in response.headers
+
+
+def test_repeated_statements_are_flagged():
+    """Test that a statement repeated past the threshold is reported as N+1"""
+    stats = QueryStats()
+    for _ in range(6):
+        stats._record_query("SELECT * FROM urls WHERE short_url = ?", 0.001)
+    stats._record_query("INSERT INTO urls VALUES (?)", 0.001)
+
+    assert stats.repeated_statements(5) == {"SELECT * FROM urls WHERE short_url = ?": 6}
+    assert stats.round_trips == 7
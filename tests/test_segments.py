@@ -0,0 +1,176 @@
+# tests/test_segments.py
+import time
+from datetime import datetime, timedelta
+import pytest
+from fastapi import status
+from app.db.models import URL
+from app.services.analytics import ClickBuffer, flush_clicks
+from app.services.cache import url_cache
+from app.services.segments import BloomFilter, Segment, SegmentEntry, SegmentStore, segment_store, write_segment
+from app.services.shortener import create_short_url, get_url_by_shortcode
+from app.services.tiering import merge_segments, run_tiering
+
+OLD = datetime.utcnow() - timedelta(days=400)
+
+
+def make_entries(count, prefix="code"):
+    return [
+        SegmentEntry(f"{prefix}{i:06d}", f"https://example.com/{prefix}/{i}", i % 3 == 0, datetime(2024, 1, 7, 12, 0))
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def segment_dir(tmp_path):
+    """
+    Points the shared segment store at an empty temporary directory.
+
+    Example:
+        ```python
+        def test_cold_lookup(db_session, segment_dir):
+            run_tiering(db_session, segment_store, cold_after_days=30)
+        ```
+    """
+    previous = segment_store.directory
+    segment_store.configure(str(tmp_path))
+    yield str(tmp_path)
+    segment_store.configure(previous)
+
+
+def add_old_url(db_session, short_url, original_url, is_custom=True):
+    db_session.add(URL(short_url=short_url, original_url=original_url, is_custom=is_custom, created_at=OLD))
+    db_session.commit()
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Test that every added key is found and the false positive rate is near the target"""
+    bloom = BloomFilter.for_capacity(10_000, 0.01)
+    for i in range(10_000):
+        bloom.add(f"member-{i}")
+
+    assert all(f"member-{i}" in bloom for i in range(10_000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10_000))
+    assert false_positives < 300
+
+
+def test_segment_round_trip(tmp_path):
+    """Test that every entry is found across blocks and absent codes are not"""
+    path = str(tmp_path / "test.seg")
+    entries = make_entries(1_000)
+    assert write_segment(path, entries, capacity=len(entries), block_size=64) == 1_000
+
+    segment = Segment(path)
+    try:
+        assert segment.entry_count == 1_000
+        for entry in entries[::37]:
+            assert segment.get(entry.short_url) == entry
+        assert segment.get("code999999") is None
+        assert segment.get("aaa") is None
+        assert list(segment) == entries
+    finally:
+        segment.close()
+
+
+def test_created_at_ignores_local_time_zone(tmp_path, monkeypatch):
+    """Test that naive UTC timestamps survive a write and read in a zone with a DST gap"""
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        path = str(tmp_path / "dst.seg")
+        entry = SegmentEntry("dst-link", "https://example.com/dst", True, datetime(2024, 3, 10, 2, 30, 15, 250000))
+        write_segment(path, [entry], capacity=1)
+        segment = Segment(path)
+        assert segment.get("dst-link") == entry
+        segment.close()
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def test_segment_rejects_unknown_format(tmp_path):
+    """Test that a file that is not a segment is refused"""
+    path = tmp_path / "bad.seg"
+    path.write_bytes(b"NOPE" + bytes(64))
+    with pytest.raises(ValueError):
+        Segment(str(path))
+
+
+def test_store_sees_segments_from_other_processes(tmp_path):
+    """Test that a segment written through another store is found on the next lookup"""
+    reader = SegmentStore(str(tmp_path))
+    writer = SegmentStore(str(tmp_path))
+    assert reader.get("code000001") is None
+
+    write_segment(writer.new_path(), make_entries(10), capacity=10)
+
+    assert reader.get("code000001").original_url == "https://example.com/code/1"
+    reader.close()
+    writer.close()
+
+
+def test_merge_keeps_every_entry_once(segment_dir):
+    """Test that merging dedupes repeated codes and removes the input files"""
+    for prefix in ("a", "b", "c"):
+        write_segment(segment_store.new_path(), make_entries(50, prefix), capacity=50)
+    # A crash between writing a segment and deleting its rows can tier a row twice
+    write_segment(segment_store.new_path(), make_entries(5, "a"), capacity=5)
+
+    merge_segments(segment_store, max_count=1)
+
+    segments = segment_store.segments
+    assert len(segments) == 1
+    assert segments[0].entry_count == 150
+    assert segment_store.get("b000042").original_url == "https://example.com/b/42"
+
+
+class TestTiering:
+    """Moving cold rows out of the urls table"""
+
+    def test_cold_rows_move_and_stay_resolvable(self, db_session, segment_dir):
+        """Test that a tiered URL is deleted from the table but still resolves"""
+        add_old_url(db_session, "cold-link", "https://example.com/cold")
+
+        assert run_tiering(db_session, segment_store, cold_after_days=30) == 1
+
+        assert db_session.query(URL).filter(URL.short_url == "cold-link").first() is None
+        url_cache.clear()
+        assert get_url_by_shortcode(db_session, "cold-link") == "https://example.com/cold"
+
+    def test_recent_and_clicked_rows_stay(self, db_session, segment_dir):
+        """Test that new URLs and old URLs clicked inside the window are not tiered"""
+        db_session.add(URL(short_url="new-link", original_url="https://example.com/new", is_custom=True))
+        add_old_url(db_session, "busy-link", "https://example.com/busy")
+        buffer = ClickBuffer(max_pending=10)
+        buffer.record("busy-link", datetime.utcnow() - timedelta(days=2))
+        flush_clicks(db_session, buffer)
+
+        assert run_tiering(db_session, segment_store, cold_after_days=30) == 0
+        assert db_session.query(URL).count() == 2
+
+    def test_redirect_falls_back_to_segments(self, client, db_session, segment_dir):
+        """Test that the redirect endpoint serves tiered URLs"""
+        add_old_url(db_session, "cold-link", "https://example.com/cold")
+        run_tiering(db_session, segment_store, cold_after_days=30)
+
+        response = client.get("/cold-link")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"url": "https://example.com/cold"}
+
+    def test_custom_code_taken_by_cold_url(self, client, db_session, segment_dir):
+        """Test that a tiered custom code cannot be claimed again"""
+        add_old_url(db_session, "cold-link", "https://example.com/cold")
+        run_tiering(db_session, segment_store, cold_after_days=30)
+
+        response = client.post("/url", json={"target_url": "https://example.org", "custom_url": "cold-link"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_auto_url_returns_cold_record(self, client, db_session, segment_dir):
+        """Test that re-shortening a tiered URL returns the existing code without a new row"""
+        target = "https://example.com/very/long/path/to/test"
+        add_old_url(db_session, create_short_url(target), target, is_custom=False)
+        run_tiering(db_session, segment_store, cold_after_days=30)
+
+        response = client.post("/url", json={"target_url": target})
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json()["short_url"] == create_short_url(target)
+        assert db_session.query(URL).count() == 0
@@ -0,0 +1,211 @@
+# tests/test_server.py
+import itertools
+import os
+import signal
+import socket
+import time
+import pytest
+from app import server as server_module
+from app.server import WORKER_STARTUP_FAILED, Arbiter, bind_socket, default_workers
+
+
+def make_arbiter(**overrides):
+    options = {
+        "host": "127.0.0.1",
+        "port": 0,
+        "workers": 2,
+        "max_requests": 0,
+        "max_requests_jitter": 0,
+        "health_timeout": 30.0,
+        "graceful_timeout": 30.0,
+        "reuse_port": False,
+    }
+    options.update(overrides)
+    return Arbiter(None, **options)
+
+
+@pytest.fixture
+def fake_processes(monkeypatch):
+    """
+    Replaces fork, waitpid and kill with bookkeeping so the master loop can be
+    driven without starting processes. Queue exits with `exit(pid, code)`.
+
+    Example:
+        ```python
+        def test_reap(fake_processes):
+            arbiter = make_arbiter()
+            arbiter.spawn_worker()
+            fake_processes.exit(1000, 0)
+            arbiter.reap_workers()
+        ```
+    """
+    class Processes:
+        def __init__(self):
+            self.pids = itertools.count(1000)
+            self.exited = []
+            self.killed = []
+
+        def exit(self, pid, code):
+            self.exited.append((pid, code << 8))
+
+        def waitpid(self, pid, options):
+            return self.exited.pop(0) if self.exited else (0, 0)
+
+        def kill(self, pid, sig):
+            self.killed.append((pid, sig))
+            if sig == signal.SIGKILL:
+                self.exited.append((pid, signal.SIGKILL))
+
+    processes = Processes()
+    monkeypatch.setattr(os, "fork", lambda: next(processes.pids))
+    monkeypatch.setattr(os, "waitpid", processes.waitpid)
+    monkeypatch.setattr(Arbiter, "kill", staticmethod(processes.kill))
+    return processes
+
+
+def test_default_workers():
+    """Test that the default worker count is at least one"""
+    assert default_workers() >= 1
+
+
+def test_bind_socket_shared():
+    """Test that a shared socket is inheritable and holds the port exclusively"""
+    sock = bind_socket("127.0.0.1", 0, reuse_port=False)
+    try:
+        assert sock.get_inheritable()
+        with pytest.raises(OSError):
+            bind_socket("127.0.0.1", sock.getsockname()[1], reuse_port=False)
+    finally:
+        sock.close()
+
+
+@pytest.mark.skipif(not hasattr(socket, "SO_REUSEPORT"), reason="SO_REUSEPORT not supported")
+def test_bind_socket_reuse_port():
+    """Test that every worker can bind its own socket to the same port"""
+    first = bind_socket("127.0.0.1", 0, reuse_port=True)
+    second = bind_socket("127.0.0.1", first.getsockname()[1], reuse_port=True)
+    assert first.getsockname() == second.getsockname()
+    first.close()
+    second.close()
+
+
+def test_sighup_ignored_during_restart(monkeypatch):
+    """Test that a second SIGHUP does not start more workers while old ones are still stopping"""
+    arbiter = make_arbiter()
+    monkeypatch.setattr(arbiter, "spawn_worker", lambda: pytest.fail("spawned a worker"))
+    arbiter.retiring[12345] = float("inf")
+    arbiter.signals.append(signal.SIGHUP)
+
+    arbiter.handle_signals()
+
+    assert arbiter.running
+
+
+def test_sigterm_stops_master():
+    """Test that SIGTERM ends the master loop"""
+    arbiter = make_arbiter()
+    arbiter.signals.append(signal.SIGTERM)
+
+    arbiter.handle_signals()
+
+    assert not arbiter.running
+
+
+def test_spawn_assigns_free_slots(fake_processes):
+    """Test that workers get distinct heartbeat slots and reaped slots are reused"""
+    arbiter = make_arbiter()
+    arbiter.spawn_missing()
+    assert arbiter.workers == {1000, 1001}
+    assert sorted(arbiter.slots.values()) == [0, 1]
+
+    fake_processes.exit(1000, 0)
+    arbiter.reap_workers()
+    assert arbiter.workers == {1001} and 1000 not in arbiter.slots
+
+    arbiter.spawn_missing()
+    assert arbiter.slots[1002] == 0
+
+
+def test_recycled_worker_is_replaced(fake_processes):
+    """Test that a worker exiting after max requests is replaced without delay"""
+    arbiter = make_arbiter(max_requests=100)
+    arbiter.spawn_missing()
+    fake_processes.exit(1001, 0)
+
+    arbiter.reap_workers()
+    arbiter.spawn_missing()
+
+    assert arbiter.workers == {1000, 1002}
+    assert arbiter.startup_failures == 0
+
+
+def test_hung_worker_is_killed_and_replaced(fake_processes):
+    """Test that a worker whose heartbeat stops is killed and a new one started"""
+    arbiter = make_arbiter(health_timeout=5.0)
+    arbiter.spawn_missing()
+    arbiter.heartbeats[arbiter.slots[1000]] = time.monotonic() - 10
+
+    arbiter.check_health()
+    arbiter.spawn_missing()
+
+    assert (1000, signal.SIGKILL) in fake_processes.killed
+    assert arbiter.workers == {1001, 1002}
+    arbiter.reap_workers()
+    assert 1000 not in arbiter.slots and not arbiter.retiring
+
+
+def test_failed_restart_does_not_exhaust_slots(fake_processes):
+    """Test that new workers killed during a rolling restart are replaced before they are reaped"""
+    arbiter = make_arbiter(health_timeout=5.0)
+    arbiter.spawn_missing()
+    arbiter.signals.append(signal.SIGHUP)
+    arbiter.handle_signals()
+    fake_processes.killed.clear()
+    fake_processes.exited.clear()
+    assert arbiter.workers == {1002, 1003} and len(arbiter.slots) == 4
+
+    # The new workers hang in startup and are killed; nothing has been reaped yet
+    for pid in (1002, 1003):
+        arbiter.heartbeats[arbiter.slots[pid]] = time.monotonic() - 10
+    arbiter.check_health()
+    arbiter.spawn_missing()
+    assert arbiter.workers == {1004, 1005} and len(arbiter.slots) == 6
+
+    # With every slot held, starting waits for a reap instead of failing
+    arbiter.workers.clear()
+    arbiter.spawn_missing()
+    assert arbiter.workers == set()
+    arbiter.reap_workers()
+    arbiter.spawn_missing()
+    assert len(arbiter.workers) == 2
+
+
+def test_startup_failures_back_off(fake_processes, monkeypatch):
+    """Test that workers failing in lifespan are restarted with a growing delay"""
+    now = [100.0]
+    monkeypatch.setattr(server_module.time, "monotonic", lambda: now[0])
+    arbiter = make_arbiter(workers=1)
+    arbiter.spawn_missing()
+
+    fake_processes.exit(1000, WORKER_STARTUP_FAILED)
+    arbiter.reap_workers()
+    arbiter.spawn_missing()
+    assert arbiter.workers == set()
+    now[0] += 1.1
+    arbiter.spawn_missing()
+    assert arbiter.workers == {1001}
+
+    fake_processes.exit(1001, WORKER_STARTUP_FAILED)
+    arbiter.reap_workers()
+    now[0] += 1.1
+    arbiter.spawn_missing()
+    assert arbiter.workers == set()
+    now[0] += 1.0
+    arbiter.spawn_missing()
+    assert arbiter.workers == {1002}
+
+    # A heartbeat after startup resets the backoff
+    now[0] += 1.0
+    arbiter.heartbeats[arbiter.slots[1002]] = now[0]
+    arbiter.check_health()
+    assert arbiter.startup_failures == 0
@@ -1,6 +1,7 @@
 # tests/test_shortener.py
 import pytest
-from app.services.shortener import create_short_url, validate_custom_url
+from app.db.models import URL
+from app.services.shortener import create_short_url, validate_custom_url, get_url_by_shortcode
 from app.core.config import get_settings
 from app.schemas.url import URLBase
 
@@ -51,3 +52,11 @@ def test_url_schema_validation(url, expected_valid):
     except Exception:
         is_valid = False
     assert is_valid == expected_valid
+
+def test_get_url_by_shortcode_returns_target_string(db_session):
+    """Test the lean lookup returns the plain target URL, or None on a miss"""
+    db_session.add(URL(original_url="https://example.com/target", short_url="lookup1"))
+    db_session.flush()
+
+    assert get_url_by_shortcode(db_session, "lookup1") == "https://example.com/target"
+    assert get_url_by_shortcode(db_session, "missing") is None
@@ -0,0 +1,98 @@
+# tests/test_snapshot.py
+import pytest
+from app.core.config import get_settings
+from app.services.cache import URLCache
+from app.services.snapshot import HEADER, load_snapshot, write_snapshot
+
+settings = get_settings()
+
+
+@pytest.fixture
+def hot_cache():
+    """
+    Provides a cache with three entries of different hotness.
+
+    Example:
+        ```python
+        def test_hottest(hot_cache):
+            assert hot_cache.hottest(1)[0][0] == "hot1"
+        ```
+    """
+    cache = URLCache(max_entries=10)
+    cache.put("hot1", "https://example.com/1")
+    cache.put("warm", "https://example.com/2")
+    cache.put("cold", "https://example.com/3")
+    for _ in range(5):
+        cache.get("hot1")
+    cache.get("warm")
+    return cache
+
+
+def test_cache_evicts_least_recently_used():
+    """Test that the cache stays within max_entries"""
+    cache = URLCache(max_entries=2)
+    cache.put("aaaa", "https://example.com/a")
+    cache.put("bbbb", "https://example.com/b")
+    cache.get("aaaa")
+    cache.put("cccc", "https://example.com/c")
+
+    assert cache.get("bbbb") is None
+    assert cache.get("aaaa") == "https://example.com/a"
+    assert len(cache) == 2
+
+
+def test_snapshot_round_trip_keeps_hottest(tmp_path, hot_cache):
+    """Test that only the hottest entries are written and loaded back with their hits"""
+    path = str(tmp_path / "cache.snapshot")
+    assert write_snapshot(hot_cache, path, top_n=2) == 2
+
+    fresh = URLCache(max_entries=10)
+    assert load_snapshot(fresh, path) == 2
+    assert fresh.get("hot1") == "https://example.com/1"
+    assert fresh.get("warm") == "https://example.com/2"
+    assert fresh.get("cold") is None
+    assert fresh.hottest(1)[0][0] == "hot1"
+
+
+def test_snapshot_does_not_override_live_entries(tmp_path, hot_cache):
+    """Test that entries cached before the snapshot finished loading win"""
+    path = str(tmp_path / "cache.snapshot")
+    write_snapshot(hot_cache, path, top_n=3)
+
+    live = URLCache(max_entries=10)
+    live.put("hot1", "https://example.com/live")
+    assert load_snapshot(live, path) == 2
+    assert live.get("hot1") == "https://example.com/live"
+
+
+def test_stale_snapshot_is_rejected(tmp_path, hot_cache):
+    """Test that snapshots older than the max age are ignored"""
+    path = str(tmp_path / "cache.snapshot")
+    write_snapshot(hot_cache, path, top_n=3)
+
+    assert load_snapshot(URLCache(max_entries=10), path, max_age=-1) == 0
+
+
+def test_snapshot_from_other_app_version_is_rejected(tmp_path, hot_cache, monkeypatch):
+    """Test that snapshots written by a different app version are ignored"""
+    path = str(tmp_path / "cache.snapshot")
+    write_snapshot(hot_cache, path, top_n=3)
+    monkeypatch.setattr(settings, "APP_VERSION", "999.0.0")
+
+    assert load_snapshot(URLCache(max_entries=10), path) == 0
+
+
+def test_corrupt_snapshot_is_rejected(tmp_path):
+    """Test that truncated or garbage files do not raise"""
+    path = tmp_path / "cache.snapshot"
+    path.write_bytes(b"URLS")
+    assert load_snapshot(URLCache(max_entries=10), str(path)) == 0
+
+    app_version = settings.APP_VERSION.encode()
+    path.write_bytes(HEADER.pack(b"URLS", 1, 0.0, 1, len(app_version)) + app_version + b"garbage")
+    assert load_snapshot(URLCache(max_entries=10), str(path), max_age=2 ** 62) == 0
+
+
+def test_missing_snapshot_starts_cold(tmp_path):
+    """Test that a missing snapshot file is not an error"""
+    assert load_snapshot(URLCache(max_entries=10), str(tmp_path / "missing")) == 0